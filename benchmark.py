@@ -0,0 +1,246 @@
+"""
+Benchmark for the Flatten/Restore Round Trip
+
+Times flattening and restoring a report folder with each output backend
+(Word document vs plain-text bundle) and prints a comparison table, then the
+build and save times and output size of each Word save profile, followed by
+the cold-start time of the pbi_toolkit command line.
+By default a synthetic PBIR report is generated; set BENCH_INPUT_DIR in .env
+to benchmark a real .Report folder instead. Outputs go to a temp folder.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from directory_flattener import (
+    SAVE_PROFILES, build_word_document, flatten_directory_to_word, iter_source_files, save_document,
+)
+from restore_from_word import restore_from_word
+
+
+# Output backends compared, by output extension
+BACKENDS = {
+    'docx': 'flattened.docx',
+    'bundle': 'flattened.txt',
+}
+
+SAMPLE_VISUAL_TYPES = ['card', 'clusteredColumnChart', 'lineChart', 'tableEx', 'slicer', 'textbox']
+
+# Cold starts timed per command; the fastest run is reported
+STARTUP_RUNS = 5
+
+TOOLKIT_SCRIPT = Path(__file__).with_name('pbi_toolkit.py')
+
+
+def make_sample_report(output_dir: Path, pages: int = 20, visuals_per_page: int = 12) -> int:
+    """
+    Generate a synthetic PBIR .Report folder for benchmarking.
+
+    Returns:
+        Number of files written
+    """
+    pages_dir = output_dir / "definition" / "pages"
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    file_count = 0
+
+    page_names = [f"page{p:03d}" for p in range(pages)]
+    with open(pages_dir / "pages.json", 'w', encoding='utf-8') as f:
+        json.dump({"pageOrder": page_names, "activePageName": page_names[0]}, f, indent=2)
+    file_count += 1
+
+    for p, page_name in enumerate(page_names):
+        page_dir = pages_dir / page_name
+        page_dir.mkdir(exist_ok=True)
+        with open(page_dir / "page.json", 'w', encoding='utf-8') as f:
+            json.dump({
+                "name": page_name, "displayName": f"Page {p + 1}",
+                "displayOption": "FitToPage", "height": 720, "width": 1280,
+            }, f, indent=2)
+        file_count += 1
+
+        for v in range(visuals_per_page):
+            visual_name = f"{page_name}_visual{v:03d}"
+            visual_dir = page_dir / "visuals" / visual_name
+            visual_dir.mkdir(parents=True)
+            visual_type = SAMPLE_VISUAL_TYPES[v % len(SAMPLE_VISUAL_TYPES)]
+            with open(visual_dir / "visual.json", 'w', encoding='utf-8') as f:
+                json.dump({
+                    "name": visual_name,
+                    "position": {"x": 40 + v * 10, "y": 40 + v * 10, "z": v,
+                                 "width": 300, "height": 200, "tabOrder": v},
+                    "visual": {
+                        "visualType": visual_type,
+                        "query": {"queryState": {"Values": {"projections": [
+                            {"field": {"Measure": {"Expression": {"SourceRef": {"Entity": "Sales"}},
+                                                   "Property": f"Measure {i}"}},
+                             "queryRef": f"Sales.Measure {i}"}
+                            for i in range(5)
+                        ]}}},
+                    },
+                }, f, indent=2)
+            file_count += 1
+
+    return file_count
+
+
+def time_call(func, *args, **kwargs) -> float:
+    """Run a function with its console output suppressed; return seconds taken."""
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def benchmark_backends(input_dir: Path, work_dir: Path, backends: dict[str, str] = BACKENDS) -> list[dict]:
+    """
+    Flatten and restore input_dir with each backend.
+
+    Returns:
+        One result dict per backend: backend, flatten_s, restore_s, size_bytes
+    """
+    results = []
+    for backend, output_name in backends.items():
+        output_file = work_dir / output_name
+        restore_dir = work_dir / f"restored_{backend}"
+
+        flatten_s = time_call(flatten_directory_to_word, str(input_dir), str(output_file))
+        restore_s = time_call(restore_from_word, str(output_file), str(restore_dir))
+
+        results.append({
+            'backend': backend,
+            'flatten_s': flatten_s,
+            'restore_s': restore_s,
+            'size_bytes': output_file.stat().st_size,
+        })
+    return results
+
+
+def benchmark_save_profiles(input_dir: Path, work_dir: Path, profiles=SAVE_PROFILES) -> list[dict]:
+    """
+    Build, save and restore a Word document of input_dir with each save
+    profile, timing the in-memory build and the save separately.
+
+    Returns:
+        One result dict per profile: profile, build_s, save_s, restore_s,
+        size_bytes
+    """
+    results = []
+    for profile in profiles:
+        output_file = work_dir / f"profile_{profile}.docx"
+        restore_dir = work_dir / f"restored_{profile}"
+
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            doc, _, _, _ = build_word_document(input_dir, iter_source_files(input_dir), save_profile=profile)
+        build_s = time.perf_counter() - start
+
+        save_s = time_call(save_document, doc, output_file, profile)
+        restore_s = time_call(restore_from_word, str(output_file), str(restore_dir))
+
+        results.append({
+            'profile': profile,
+            'build_s': build_s,
+            'save_s': save_s,
+            'restore_s': restore_s,
+            'size_bytes': output_file.stat().st_size,
+        })
+    return results
+
+
+def benchmark_startup(work_dir: Path, runs: int = STARTUP_RUNS) -> list[dict]:
+    """
+    Time fresh interpreter runs of the pbi_toolkit command line: a bare
+    interpreter for reference, --help, and reformat on a one-visual report.
+
+    Returns:
+        One result dict per command: command, best_s, median_s
+    """
+    report_dir = work_dir / "Startup.Report"
+    make_sample_report(report_dir, pages=1, visuals_per_page=1)
+
+    commands = {
+        'python (no-op)': [sys.executable, '-c', 'pass'],
+        'toolkit --help': [sys.executable, str(TOOLKIT_SCRIPT), '--help'],
+        'toolkit reformat': [
+            sys.executable, str(TOOLKIT_SCRIPT), 'reformat',
+            '--input', str(report_dir), '--output', str(work_dir / "Startup_reformatted.Report"),
+        ],
+    }
+
+    results = []
+    for command, args in commands.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(args, stdout=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results.append({'command': command, 'best_s': timings[0], 'median_s': timings[len(timings) // 2]})
+    return results
+
+
+def print_results(title: str, results: list[dict]) -> None:
+    """Print benchmark results as a table."""
+    print(f"\n{title}")
+    print(f"  {'Backend':<10} {'Flatten':>10} {'Restore':>10} {'Size':>12}")
+    for r in results:
+        print(f"  {r['backend']:<10} {r['flatten_s']:>9.3f}s {r['restore_s']:>9.3f}s "
+              f"{r['size_bytes'] / 1024:>10.1f}KB")
+
+
+def print_profile_results(title: str, results: list[dict]) -> None:
+    """Print save profile results as a table."""
+    print(f"\n{title}")
+    print(f"  {'Profile':<10} {'Build':>10} {'Save':>10} {'Restore':>10} {'Size':>12}")
+    for r in results:
+        print(f"  {r['profile']:<10} {r['build_s']:>9.3f}s {r['save_s']:>9.3f}s {r['restore_s']:>9.3f}s "
+              f"{r['size_bytes'] / 1024:>10.1f}KB")
+
+
+def print_startup_results(title: str, results: list[dict]) -> None:
+    """Print start-up timings as a table."""
+    print(f"\n{title}")
+    print(f"  {'Command':<18} {'Best':>10} {'Median':>10}")
+    for r in results:
+        print(f"  {r['command']:<18} {r['best_s'] * 1000:>8.1f}ms {r['median_s'] * 1000:>8.1f}ms")
+
+
+def main():
+    """Main entry point."""
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    input_dir = os.getenv('BENCH_INPUT_DIR')
+
+    print(f"Flatten/Restore Benchmark")
+    print(f"{'='*50}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+
+        if input_dir:
+            input_path = Path(input_dir)
+            if not input_path.is_dir():
+                raise FileNotFoundError(f"Benchmark input directory not found: {input_dir}")
+            print(f"Input:  {input_path}")
+        else:
+            input_path = work_dir / "Sample.Report"
+            file_count = make_sample_report(input_path)
+            print(f"Input:  synthetic report ({file_count} files)")
+        print(f"{'='*50}")
+
+        print_results("Backends:", benchmark_backends(input_path, work_dir))
+        print_profile_results("Word save profiles:", benchmark_save_profiles(input_path, work_dir))
+        print_startup_results("Start-up:", benchmark_startup(work_dir))
+
+
+if __name__ == '__main__':
+    main()
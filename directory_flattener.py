@@ -5,20 +5,22 @@ Recursively reads all files from a directory and outputs them to a Word document
 in a structured format that can be parsed back to restore the original files.
 """
 
+import codecs
 import os
+import re
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from dotenv import load_dotenv
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_BREAK
 
+from flatten_format import (
+    BUNDLE_END_SEPARATOR, FILE_END_MARKER, FILE_START_PATTERN,
+    chunks_frame, chunks_hash, file_frame, format_file_marker, format_ref_marker, is_bundle, manifest_path_for,
+    parse_file_marker, parse_path_list, parse_ref_marker, read_index_part, volume_path_for, write_index_part,
+    write_manifest,
+)
 
-# Load environment variables
-load_dotenv()
-
-# File delimiter markers (used for parsing back)
-FILE_START_MARKER = "═══ FILE: {path} ═══"
-FILE_END_MARKER = "═══ END FILE ═══"
 
 # Binary/unreadable file extensions to skip
 BINARY_EXTENSIONS = {
@@ -29,6 +31,176 @@ BINARY_EXTENSIONS = {
     '.pyc', '.pyo', '.class',
 }
 
+# .gitignore-style patterns for folders and files that are never worth
+# flattening; whole directories matching these are pruned before descending
+DEFAULT_EXCLUDE_PATTERNS = [
+    '.git/', 'node_modules/', '__pycache__/', '.venv/', 'cache.abf',
+]
+
+# Files larger than this many bytes are streamed into the document in
+# line-aligned chunks of about this many characters, one paragraph each
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Encodings tried, in order, when reading text files
+TEXT_ENCODINGS = ['utf-8', 'utf-8-sig', 'utf-16', 'latin-1']
+
+# Save profiles for Word output: zip compression of the .docx package
+# (compress_level None = zlib default), whether content runs share one
+# character style instead of each carrying its own font properties, and
+# whether every file section ends with a page break. 'standard' writes what
+# python-docx's Document.save() writes; 'fast' and 'store' trade output size
+# for save time and smaller document XML.
+# The *_bytes entries are rough upper bounds of the .docx bytes taken by the
+# empty package, by each file section and by each content line, on top of
+# the file content itself; plan_volumes() uses them to keep volumes under
+# VOLUME_MAX_BYTES. Compressed markup is small, but stored XML is not.
+SAVE_PROFILES = {
+    'standard': {
+        'compression': zipfile.ZIP_DEFLATED, 'compress_level': None, 'shared_style': False, 'page_breaks': True,
+        'package_bytes': 40_000, 'section_bytes': 200, 'line_bytes': 0,
+    },
+    'fast': {
+        'compression': zipfile.ZIP_DEFLATED, 'compress_level': 1, 'shared_style': True, 'page_breaks': False,
+        'package_bytes': 60_000, 'section_bytes': 200, 'line_bytes': 0,
+    },
+    'store': {
+        'compression': zipfile.ZIP_STORED, 'compress_level': None, 'shared_style': True, 'page_breaks': False,
+        'package_bytes': 840_000, 'section_bytes': 1000, 'line_bytes': 40,
+    },
+}
+DEFAULT_SAVE_PROFILE = 'standard'
+
+# Character style shared by content runs when a profile uses shared_style
+CODE_STYLE_NAME = 'PBI Code'
+
+# Rough page estimate for volume budgets: every file starts on a new page and
+# a page of 9pt Consolas holds about this many characters
+PAGE_CHARS_ESTIMATE = 4000
+
+
+def compile_patterns(patterns: list[str]) -> list[tuple[re.Pattern, bool, bool]]:
+    """
+    Compile .gitignore-style patterns into (regex, negated, directory_only)
+    rules matched against slash-separated relative paths.
+
+    Supported syntax: `*`, `?`, `[...]`, `**`, a leading `!` to re-include,
+    a trailing `/` for directories only, and a leading or inner `/` to anchor
+    the pattern at the root (otherwise it matches at any depth).
+    """
+    rules = []
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith('#'):
+            continue
+
+        negated = pattern.startswith('!')
+        if negated:
+            pattern = pattern[1:]
+        directory_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+
+        regex = ''
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                regex += '(?:.*/)?'
+                i += 3
+            elif pattern.startswith('**', i):
+                regex += '.*'
+                i += 2
+            elif pattern[i] == '*':
+                regex += '[^/]*'
+                i += 1
+            elif pattern[i] == '?':
+                regex += '[^/]'
+                i += 1
+            elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+                end = pattern.index(']', i + 1)
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                regex += '[' + body + ']'
+                i = end + 1
+            else:
+                regex += re.escape(pattern[i])
+                i += 1
+
+        prefix = '^' if anchored else '^(?:.*/)?'
+        rules.append((re.compile(prefix + regex + '$'), negated, directory_only))
+    return rules
+
+
+def is_excluded(relative_path: str, is_dir: bool, rules: list) -> bool:
+    """Apply compiled exclude rules to a path; the last matching rule wins."""
+    excluded = False
+    for regex, negated, directory_only in rules:
+        if directory_only and not is_dir:
+            continue
+        if regex.match(relative_path):
+            excluded = not negated
+    return excluded
+
+
+def is_included(relative_path: str, rules: list) -> bool:
+    """
+    Apply compiled include rules to a file path; the last matching rule wins.
+
+    A pattern matching one of the file's parent directories (e.g.
+    `definition/`) matches every file beneath it. If the first rule is
+    negated (e.g. `!*.txt`), every file not matched by a rule is included.
+    """
+    directories = relative_path.split('/')[:-1]
+    parents = ['/'.join(directories[:i]) for i in range(1, len(directories) + 1)]
+
+    included = bool(rules) and rules[0][1]
+    for regex, negated, directory_only in rules:
+        if (not directory_only and regex.match(relative_path)) or any(regex.match(p) for p in parents):
+            included = not negated
+    return included
+
+
+def walk_directory(input_path: Path, exclude: list[str] | None = None, include: list[str] | None = None):
+    """
+    Yield the files under a directory in sorted (depth-first) order.
+
+    Uses os.scandir and prunes excluded directories before descending into
+    them, so entries are produced lazily without listing the whole tree.
+
+    Args:
+        input_path: Directory to walk
+        exclude: Extra .gitignore-style exclude patterns (added to
+            DEFAULT_EXCLUDE_PATTERNS; prefix with `!` to re-include)
+        include: If given, only files these patterns include are yielded
+            (see is_included)
+    """
+    exclude_rules = compile_patterns(DEFAULT_EXCLUDE_PATTERNS + (exclude or []))
+    include_rules = compile_patterns(include) if include else None
+
+    def walk(dir_path: str, prefix: str):
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"  Error reading {dir_path}: {e}")
+            return
+
+        for entry in entries:
+            relative_path = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not is_excluded(relative_path, True, exclude_rules):
+                    yield from walk(entry.path, relative_path + '/')
+                continue
+
+            if is_excluded(relative_path, False, exclude_rules):
+                continue
+            if include_rules and not is_included(relative_path, include_rules):
+                continue
+            yield Path(entry.path)
+
+    yield from walk(str(input_path), '')
+
 
 def is_binary_file(file_path: Path) -> bool:
     """Check if a file is likely binary based on extension or content."""
@@ -49,9 +221,7 @@ def is_binary_file(file_path: Path) -> bool:
 
 def read_file_content(file_path: Path) -> str | None:
     """Read file content, trying different encodings."""
-    encodings = ['utf-8', 'utf-8-sig', 'utf-16', 'latin-1']
-
-    for encoding in encodings:
+    for encoding in TEXT_ENCODINGS:
         try:
             with open(file_path, 'r', encoding=encoding) as f:
                 return f.read()
@@ -64,27 +234,337 @@ def read_file_content(file_path: Path) -> str | None:
     return None
 
 
-def flatten_directory_to_word(input_dir: str, output_file: str) -> None:
+def detect_encoding(file_path: Path, block_size: int = 1024 * 1024) -> str | None:
     """
-    Flatten a directory's contents into a Word document.
+    Find the first encoding that decodes the whole file, reading it in
+    blocks so large files are never held in memory.
+    """
+    for encoding in TEXT_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(file_path, 'rb') as f:
+                while block := f.read(block_size):
+                    decoder.decode(block)
+                decoder.decode(b'', final=True)
+            return encoding
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            return None
 
-    Args:
-        input_dir: Path to the directory to flatten
-        output_file: Path to the output Word document
+    return None
+
+
+def iter_file_chunks(file_path: Path, encoding: str, chunk_size: int):
     """
-    input_path = Path(input_dir)
+    Stream a text file as line-aligned chunks of at least chunk_size
+    characters (a single longer line stays in one chunk).
 
-    if not input_path.exists():
-        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    The newline at each chunk boundary is dropped, because the restorer joins
+    content paragraphs with newlines: '\\n'.join(chunks) equals the content
+    read_file_content() would return, byte for byte.
+    """
+    with open(file_path, 'r', encoding=encoding) as f:
+        buffer = []
+        size = 0
+        for line in f:
+            buffer.append(line)
+            size += len(line)
+            if size >= chunk_size and line.endswith('\n'):
+                yield ''.join(buffer)[:-1]
+                buffer = []
+                size = 0
+        yield ''.join(buffer)
 
-    if not input_path.is_dir():
-        raise NotADirectoryError(f"Input path is not a directory: {input_dir}")
+
+def content_chunks(content):
+    """
+    Return the paragraph chunks for file content yielded by
+    iter_source_files(): a string, or a callable streaming chunks.
+    """
+    return content() if callable(content) else [content]
+
+
+def iter_source_files(
+    input_path: Path,
+    relative_paths: list[str] | None = None,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+):
+    """
+    Walk a directory in sorted order and yield (relative_path, content) for
+    each file. Content is None for binary or unreadable files, which are
+    reported as they are skipped.
+
+    Files larger than chunk_size bytes are not read up front: their content
+    is a callable returning a fresh stream of line-aligned chunks (see
+    iter_file_chunks). A chunk_size of 0 reads every file whole.
+
+    If relative_paths is given, only those files are read (in that order);
+    otherwise the directory is walked with the given exclude/include patterns.
+    """
+    if relative_paths is None:
+        file_paths = walk_directory(input_path, exclude, include)
+    else:
+        file_paths = (input_path / p for p in relative_paths)
+
+    for file_path in file_paths:
+        # Get relative path for the marker
+        relative_path = file_path.relative_to(input_path)
+
+        # Skip binary files
+        if is_binary_file(file_path):
+            print(f"  Skipping binary: {relative_path}")
+            yield relative_path, None
+            continue
+
+        # Stream large files in chunks instead of reading them whole
+        if chunk_size and file_path.stat().st_size > chunk_size:
+            encoding = detect_encoding(file_path)
+            if encoding is None:
+                print(f"  Could not read: {relative_path}")
+                yield relative_path, None
+            else:
+                yield relative_path, partial(iter_file_chunks, file_path, encoding, chunk_size)
+            continue
+
+        # Read file content
+        content = read_file_content(file_path)
+        if content is None:
+            print(f"  Could not read: {relative_path}")
+
+        yield relative_path, content
+
+
+def code_style_id(doc) -> str:
+    """Return the ID of the shared code character style (Consolas 9pt), adding it if missing."""
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.shared import Pt
+
+    if CODE_STYLE_NAME in doc.styles:
+        return doc.styles[CODE_STYLE_NAME].style_id
+    style = doc.styles.add_style(CODE_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+    style.font.name = 'Consolas'
+    style.font.size = Pt(9)
+    return style.style_id
+
+
+def add_file_section(
+    doc,
+    relative_path: str,
+    content,
+    style_id: str | None = None,
+    page_break: bool = True
+) -> tuple[list, str]:
+    """
+    Append one file's section (marker, content, end marker and optional page
+    break) to the end of the document.
+
+    Content is a string, or a callable streaming chunks (see
+    iter_source_files); each chunk gets its own paragraph. The FILE marker is
+    framed with the paragraph count, byte length and hash of the content.
+    Content runs get the character style with the given ID (see
+    code_style_id) if any, otherwise each run is set to Consolas 9pt directly.
+
+    Returns:
+        Tuple of (the section's paragraph elements in document order,
+        content hash)
+    """
+    from docx.enum.text import WD_BREAK
+    from docx.shared import Pt
+
+    # Add file start marker as heading (its text is set once the frame is known)
+    heading = doc.add_heading('', level=2)
+
+    # Add file content in code-style paragraphs, framing it on the way
+    content_paras = []
+
+    def add_chunks():
+        for chunk in content_chunks(content):
+            content_para = doc.add_paragraph()
+            content_run = content_para.add_run(chunk)
+            if style_id is None:
+                content_run.font.name = 'Consolas'
+                content_run.font.size = Pt(9)
+            else:
+                # Set on the element: Run.style looks the style up again on every call
+                content_run._r.style = style_id
+            content_paras.append(content_para._p)
+            yield chunk
+
+    frame = chunks_frame(add_chunks())
+    heading.add_run(format_file_marker(relative_path, frame))
+
+    # Add end marker
+    end_para = doc.add_paragraph()
+    end_run = end_para.add_run(FILE_END_MARKER)
+    end_run.bold = True
+    elements = [heading._p, *content_paras, end_para._p]
+
+    # Add page break between files for readability
+    if page_break:
+        break_para = doc.add_paragraph()
+        break_para.add_run().add_break(WD_BREAK.PAGE)
+        elements.append(break_para._p)
+
+    return elements, frame['hash']
+
+
+def save_document(doc, output_path: Path, profile: str = DEFAULT_SAVE_PROFILE) -> None:
+    """
+    Save a document with the zip compression of a save profile.
+
+    Writes the same package parts, in the same order, as python-docx's
+    Document.save(), which always uses the default deflate level.
+    """
+    from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+    from docx.opc.pkgwriter import _ContentTypesItem
+
+    settings = SAVE_PROFILES[profile]
+    package = doc.part.package
+    parts = package.parts
+    for part in parts:
+        part.before_marshal()
+
+    with zipfile.ZipFile(
+        output_path, 'w', compression=settings['compression'], compresslevel=settings['compress_level']
+    ) as zf:
+        zf.writestr(CONTENT_TYPES_URI.membername, _ContentTypesItem.from_parts(parts).blob)
+        zf.writestr(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+        for part in parts:
+            zf.writestr(part.partname.membername, part.blob)
+            if len(part.rels):
+                zf.writestr(part.partname.rels_uri.membername, part.rels.xml)
+
+
+def paragraph_text(p) -> str:
+    """Return the stripped text of a paragraph element (for marker matching)."""
+    return p.text.strip()
+
+
+def is_end_marker(p) -> bool:
+    """Check whether a paragraph element is a FILE end marker."""
+    return paragraph_text(p) == FILE_END_MARKER
+
+
+def is_page_break_paragraph(p) -> bool:
+    """Check whether a paragraph element only holds a page break."""
+    return bool(p.xpath('./w:r/w:br[@w:type="page"]')) and not paragraph_text(p)
+
+
+def locate_sections(doc, index: list[dict] | None) -> dict[str, list]:
+    """
+    Find each file section's paragraph elements in an existing document.
+
+    Uses the embedded index when it still matches the document, otherwise
+    scans the paragraphs for FILE markers.
+
+    Returns:
+        Dictionary mapping relative paths to their section's paragraph elements
+    """
+    paragraphs = doc.element.body.xpath('./w:p')
+
+    def section_end(end: int) -> int:
+        # Include the trailing page-break paragraph, if any
+        if end + 1 < len(paragraphs) and is_page_break_paragraph(paragraphs[end + 1]):
+            return end + 2
+        return end + 1
+
+    if index is not None:
+        sections = {}
+        for entry in index:
+            if 'source' in entry:
+                continue
+            start = entry['offset']
+            end = start + entry['length'] + 1
+            if end >= len(paragraphs):
+                break
+            start_match = re.match(FILE_START_PATTERN, paragraph_text(paragraphs[start]))
+            if not start_match or start_match.group(1) != entry['path'] \
+                    or not is_end_marker(paragraphs[end]):
+                break
+            sections[entry['path']] = paragraphs[start:section_end(end)]
+        else:
+            return sections
+        print("  File index is out of date - scanning the whole document")
+
+    sections = {}
+    current_file = None
+    start = 0
+    for i, p in enumerate(paragraphs):
+        text = paragraph_text(p)
+        start_match = re.match(FILE_START_PATTERN, text)
+        if start_match:
+            current_file = start_match.group(1)
+            start = i
+        elif text == FILE_END_MARKER and current_file:
+            sections[current_file] = paragraphs[start:section_end(i)]
+            current_file = None
+
+    return sections
+
+
+def build_index_entries(doc, sections: list[tuple[str, list, str]]) -> list[dict]:
+    """
+    Build file index entries from (path, section elements, content hash)
+    tuples, reading paragraph offsets from the document.
+    """
+    positions = {p: i for i, p in enumerate(doc.element.body.xpath('./w:p'))}
+    entries = []
+    for path, elements, digest in sections:
+        end = next(i for i, p in enumerate(elements) if i > 0 and is_end_marker(p))
+        entries.append({
+            'path': path,
+            'offset': positions[elements[0]],
+            'length': end - 1,
+            'hash': digest,
+        })
+    return entries
+
+
+def add_reference(doc, relative_path: str, source: str):
+    """Append a reference marker for a duplicate of an earlier file; return its paragraph element."""
+    ref_para = doc.add_paragraph()
+    ref_run = ref_para.add_run(format_ref_marker(relative_path, source))
+    ref_run.bold = True
+    return ref_para._p
+
+
+def build_word_document(
+    input_path: Path,
+    files,
+    title: str | None = None,
+    dedup: bool = False,
+    save_profile: str = DEFAULT_SAVE_PROFILE
+) -> tuple:
+    """
+    Build a flattened Word document in memory.
+
+    Args:
+        input_path: Directory being flattened
+        files: Iterable of (relative_path, content) pairs, as produced by
+            iter_source_files(); files with content None are counted as skipped
+        title: Document title (defaults to the directory name)
+        dedup: Write each distinct content once; later files with identical
+            content get a one-line reference to the first one instead
+        save_profile: Name of the SAVE_PROFILES entry deciding the content
+            style and page breaks
+
+    Returns:
+        Tuple of (document, files_processed, files_skipped, files_deduplicated)
+    """
+    from docx import Document
+
+    settings = SAVE_PROFILES[save_profile]
 
     # Create Word document
     doc = Document()
+    style_id = code_style_id(doc) if settings['shared_style'] else None
 
     # Add title
-    title = doc.add_heading(f"Directory Contents: {input_path.name}", level=0)
+    doc.add_heading(title or f"Directory Contents: {input_path.name}", level=0)
 
     # Add metadata paragraph
     meta = doc.add_paragraph()
@@ -94,67 +574,520 @@ def flatten_directory_to_word(input_dir: str, output_file: str) -> None:
 
     doc.add_paragraph()  # Spacer
 
+    # Track paragraph offsets for the embedded file index
+    paragraph_count = len(doc.paragraphs)
+    index_entries = []
+
     # Collect all files recursively
     files_processed = 0
     files_skipped = 0
+    files_deduplicated = 0
+    first_with_hash = {}
 
-    for file_path in sorted(input_path.rglob('*')):
-        if file_path.is_dir():
+    for relative_path, content in files:
+        if content is None:
+            files_skipped += 1
             continue
 
-        # Get relative path for the marker
-        relative_path = file_path.relative_to(input_path)
+        if dedup:
+            digest = chunks_hash(content_chunks(content))
+            source = first_with_hash.get(digest)
+            if source is not None:
+                add_reference(doc, relative_path.as_posix(), source)
+                index_entries.append({
+                    'path': relative_path.as_posix(),
+                    'offset': paragraph_count,
+                    'length': 0,
+                    'hash': digest,
+                    'source': source,
+                })
+                paragraph_count += 1
 
-        # Skip binary files
+                files_processed += 1
+                files_deduplicated += 1
+                print(f"  Duplicate: {relative_path} (same as {source})")
+                continue
+            first_with_hash[digest] = relative_path.as_posix()
+
+        elements, digest = add_file_section(
+            doc, relative_path.as_posix(), content, style_id, settings['page_breaks']
+        )
+
+        # Sections are heading, content paragraphs, end marker and page break (if any)
+        index_entries.append({
+            'path': relative_path.as_posix(),
+            'offset': paragraph_count,
+            'length': len(elements) - (3 if settings['page_breaks'] else 2),
+            'hash': digest,
+        })
+        paragraph_count += len(elements)
+
+        files_processed += 1
+        print(f"  Added: {relative_path}")
+
+    # Embed the file index so restores can jump straight to selected files
+    write_index_part(doc, index_entries)
+
+    return doc, files_processed, files_skipped, files_deduplicated
+
+
+def write_word_document(
+    input_path: Path,
+    files,
+    output_path: Path,
+    title: str | None = None,
+    dedup: bool = False,
+    save_profile: str = DEFAULT_SAVE_PROFILE
+) -> tuple[int, int, int]:
+    """
+    Build and save a flattened Word document.
+
+    Takes the same arguments as build_word_document(), plus the path of the
+    output Word document.
+
+    Returns:
+        Tuple of (files_processed, files_skipped, files_deduplicated)
+    """
+    doc, files_processed, files_skipped, files_deduplicated = build_word_document(
+        input_path, files, title, dedup, save_profile
+    )
+
+    # Save document
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    save_document(doc, output_path, save_profile)
+
+    return files_processed, files_skipped, files_deduplicated
+
+
+def flatten_directory_to_word(
+    input_dir: str,
+    output_file: str,
+    update: bool = False,
+    max_volume_bytes: int = 0,
+    max_volume_pages: int = 0,
+    workers: int | None = None,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dedup: bool = False,
+    save_profile: str = DEFAULT_SAVE_PROFILE
+) -> None:
+    """
+    Flatten a directory's contents into a Word document.
+
+    If output_file has a bundle extension (.txt or .pbibundle) a plain-text
+    bundle is written instead, for fast automated round trips.
+
+    Args:
+        input_dir: Path to the directory to flatten
+        output_file: Path to the output Word document
+        update: If the output document already exists, only replace the
+            sections of files that changed since it was written
+        max_volume_bytes: Split the output into volumes of at most this many
+            bytes, estimated from the file sizes and the save profile (0 = no limit)
+        max_volume_pages: Split the output into volumes of roughly this many
+            pages (0 = no limit)
+        workers: Number of processes used to build volumes (default: CPU count)
+        exclude: Extra .gitignore-style patterns of files/folders to leave out
+        include: Only flatten files matching one of these patterns
+        chunk_size: Stream files larger than this many bytes in line-aligned
+            chunks of this size, one paragraph each (0 = never)
+        dedup: Write identical file contents once; later copies become
+            references to the first (editing the first copy in Word changes
+            every copy on restore)
+        save_profile: Name of the SAVE_PROFILES entry used for Word output:
+            'standard', 'fast' (level-1 deflate, shared code style, no page
+            breaks) or 'store' (as fast, but uncompressed). Ignored for bundles
+    """
+    input_path = Path(input_dir)
+
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+
+    if not input_path.is_dir():
+        raise NotADirectoryError(f"Input path is not a directory: {input_dir}")
+
+    if save_profile not in SAVE_PROFILES:
+        raise ValueError(f"Unknown save profile '{save_profile}' (expected one of: {', '.join(SAVE_PROFILES)})")
+
+    if is_bundle(output_file):
+        if max_volume_bytes or max_volume_pages:
+            raise ValueError("Volume output is only supported for Word documents")
+        flatten_directory_to_bundle(input_path, output_file, exclude, include, dedup)
+        return
+
+    if max_volume_bytes or max_volume_pages:
+        if update:
+            raise ValueError("Update mode cannot be combined with volume output")
+        flatten_directory_to_volumes(
+            input_path, output_file, max_volume_bytes, max_volume_pages, workers, exclude, include,
+            chunk_size, dedup, save_profile
+        )
+        return
+
+    if update and Path(output_file).exists():
+        if dedup:
+            raise ValueError("Update mode cannot be combined with dedup mode")
+        update_word_document(input_path, output_file, exclude, include, chunk_size, save_profile)
+        return
+
+    output_path = Path(output_file)
+    files = iter_source_files(input_path, exclude=exclude, include=include, chunk_size=chunk_size)
+    files_processed, files_skipped, files_deduplicated = write_word_document(
+        input_path, files, output_path, dedup=dedup, save_profile=save_profile
+    )
+
+    print(f"\n{'='*50}")
+    print(f"Flattening complete!")
+    print(f"  Files processed: {files_processed}")
+    print(f"  Files skipped: {files_skipped}")
+    if dedup:
+        print(f"  Duplicates referenced: {files_deduplicated}")
+    print(f"  Output: {output_path.absolute()}")
+
+
+def flatten_directory_to_bundle(
+    input_path: Path,
+    output_file: str,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    dedup: bool = False
+) -> None:
+    """
+    Flatten a directory into a plain-text bundle.
+
+    Each text file's raw bytes are copied between the usual FILE markers
+    (followed by a newline before the end marker), so restores are byte-exact
+    and no python-docx objects, XML or zip compression are involved. Markers
+    are framed with the file's line count, byte length and hash, so the
+    restorer can skip straight over each body. In dedup mode, files whose
+    bytes match an earlier file's are written as a one-line reference marker.
+    Bundles are always written in full; update mode only applies to Word
+    documents.
+    """
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    files_processed = 0
+    files_skipped = 0
+    files_deduplicated = 0
+    first_with_hash = {}
+
+    with open(output_path, 'wb') as out:
+        out.write(f"Directory Contents: {input_path.name}\n".encode('utf-8'))
+        out.write(f"Source: {input_path.absolute()}\n\n".encode('utf-8'))
+
+        for file_path in walk_directory(input_path, exclude, include):
+            relative_path = file_path.relative_to(input_path)
+
+            if is_binary_file(file_path):
+                print(f"  Skipping binary: {relative_path}")
+                files_skipped += 1
+                continue
+
+            frame = file_frame(file_path)
+            if dedup:
+                source = first_with_hash.setdefault(frame['hash'], relative_path.as_posix())
+                if source != relative_path.as_posix():
+                    out.write(format_ref_marker(relative_path.as_posix(), source).encode('utf-8') + b'\n')
+                    files_processed += 1
+                    files_deduplicated += 1
+                    print(f"  Duplicate: {relative_path} (same as {source})")
+                    continue
+
+            start_marker = format_file_marker(relative_path.as_posix(), frame)
+            out.write(start_marker.encode('utf-8') + b'\n')
+            with open(file_path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+            out.write(BUNDLE_END_SEPARATOR)
+
+            files_processed += 1
+            print(f"  Added: {relative_path}")
+
+    print(f"\n{'='*50}")
+    print(f"Flattening complete!")
+    print(f"  Files processed: {files_processed}")
+    print(f"  Files skipped: {files_skipped}")
+    if dedup:
+        print(f"  Duplicates referenced: {files_deduplicated}")
+    print(f"  Output: {output_path.absolute()}")
+
+
+def count_lines(file_path: Path, block_size: int = 1024 * 1024) -> int:
+    """Count the newlines in a file, reading it in blocks."""
+    lines = 0
+    with open(file_path, 'rb') as f:
+        while block := f.read(block_size):
+            lines += block.count(b'\n')
+    return lines
+
+
+def plan_volumes(
+    input_path: Path,
+    max_volume_bytes: int,
+    max_volume_pages: int,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    save_profile: str = DEFAULT_SAVE_PROFILE
+) -> tuple[list[list[str]], int]:
+    """
+    Assign files to volumes in sorted order, starting a new volume whenever
+    the byte or (estimated) page budget would be exceeded. A single file
+    larger than the budget gets a volume of its own.
+
+    The byte budget applies to the estimated size of the saved volume, using
+    the save profile's size estimates (see SAVE_PROFILES), not just the
+    bytes of the source files.
+
+    Returns:
+        Tuple of (list of relative paths per volume, binary files skipped)
+    """
+    settings = SAVE_PROFILES[save_profile]
+    volumes = [[]]
+    volume_bytes = settings['package_bytes']
+    volume_pages = 0
+    files_skipped = 0
+
+    for file_path in walk_directory(input_path, exclude, include):
+        relative_path = file_path.relative_to(input_path)
         if is_binary_file(file_path):
             print(f"  Skipping binary: {relative_path}")
             files_skipped += 1
             continue
 
-        # Read file content
-        content = read_file_content(file_path)
-        if content is None:
-            print(f"  Could not read: {relative_path}")
-            files_skipped += 1
-            continue
+        size = file_path.stat().st_size
+        pages = 1 + size // PAGE_CHARS_ESTIMATE
+        output_bytes = size + settings['section_bytes']
+        if max_volume_bytes and settings['line_bytes']:
+            output_bytes += settings['line_bytes'] * count_lines(file_path)
 
-        # Add file start marker as heading
-        start_marker = FILE_START_MARKER.format(path=relative_path.as_posix())
-        doc.add_heading(start_marker, level=2)
+        over_bytes = max_volume_bytes and volume_bytes + output_bytes > max_volume_bytes
+        over_pages = max_volume_pages and volume_pages + pages > max_volume_pages
+        if volumes[-1] and (over_bytes or over_pages):
+            volumes.append([])
+            volume_bytes = settings['package_bytes']
+            volume_pages = 0
 
-        # Add file content in a code-style paragraph
-        content_para = doc.add_paragraph()
-        content_run = content_para.add_run(content)
-        content_run.font.name = 'Consolas'
-        content_run.font.size = Pt(9)
+        volumes[-1].append(relative_path.as_posix())
+        volume_bytes += output_bytes
+        volume_pages += pages
 
-        # Add end marker
-        end_para = doc.add_paragraph()
-        end_run = end_para.add_run(FILE_END_MARKER)
-        end_run.bold = True
+    return [v for v in volumes if v], files_skipped
 
-        # Add page break between files for readability
-        doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
 
-        files_processed += 1
-        print(f"  Added: {relative_path}")
+def build_volume(
+    input_dir: str,
+    relative_paths: list[str],
+    output_file: str,
+    title: str,
+    chunk_size: int,
+    dedup: bool = False,
+    save_profile: str = DEFAULT_SAVE_PROFILE
+) -> tuple[int, int, int]:
+    """Build one volume document (runs in a worker process)."""
+    input_path = Path(input_dir)
+    files = iter_source_files(input_path, relative_paths, chunk_size=chunk_size)
+    return write_word_document(input_path, files, Path(output_file), title, dedup, save_profile)
 
-    # Save document
+
+def flatten_directory_to_volumes(
+    input_path: Path,
+    output_file: str,
+    max_volume_bytes: int,
+    max_volume_pages: int,
+    workers: int | None = None,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dedup: bool = False,
+    save_profile: str = DEFAULT_SAVE_PROFILE
+) -> None:
+    """
+    Flatten a directory into several size-capped Word documents, built in
+    parallel, plus a manifest listing which files live in which volume.
+    In dedup mode duplicates are only referenced within the same volume, so
+    each volume can still be restored on its own.
+    """
     output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    doc.save(output_path)
+    volumes, files_skipped = plan_volumes(
+        input_path, max_volume_bytes, max_volume_pages, exclude, include, save_profile
+    )
+
+    volume_paths = [volume_path_for(output_path, i + 1) for i in range(len(volumes))]
+    titles = [
+        f"Directory Contents: {input_path.name} (volume {i + 1} of {len(volumes)})"
+        for i in range(len(volumes))
+    ]
+
+    print(f"  Building {len(volumes)} volumes...\n")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            build_volume,
+            [str(input_path)] * len(volumes),
+            volumes,
+            [str(p) for p in volume_paths],
+            titles,
+            [chunk_size] * len(volumes),
+            [dedup] * len(volumes),
+            [save_profile] * len(volumes),
+        ))
+
+    files_processed = sum(processed for processed, _, _ in results)
+    files_skipped += sum(skipped for _, skipped, _ in results)
+    files_deduplicated = sum(deduplicated for _, _, deduplicated in results)
+
+    manifest_path = manifest_path_for(output_path)
+    write_manifest(manifest_path, {
+        'source': str(input_path.absolute()),
+        'volumes': [
+            {'file': volume_path.name, 'files': files}
+            for volume_path, files in zip(volume_paths, volumes)
+        ],
+    })
 
     print(f"\n{'='*50}")
     print(f"Flattening complete!")
     print(f"  Files processed: {files_processed}")
     print(f"  Files skipped: {files_skipped}")
+    if dedup:
+        print(f"  Duplicates referenced: {files_deduplicated}")
+    print(f"  Volumes: {len(volumes)}")
+    print(f"  Manifest: {manifest_path.absolute()}")
+
+
+def update_word_document(
+    input_path: Path,
+    output_file: str,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    save_profile: str = DEFAULT_SAVE_PROFILE
+) -> None:
+    """
+    Update a previously flattened Word document in place.
+
+    Sections whose source file is unchanged (same content hash as recorded in
+    the document's file index, or in the section's FILE marker when the index
+    is missing) are left as they are, including any edits made to them in
+    Word. Changed files have their section replaced, new files are inserted
+    in sorted position and deleted files are removed. Reference
+    markers left by dedup mode are dropped and their files written in full.
+
+    Args:
+        input_path: Directory that was flattened
+        output_file: Existing flattened Word document to update
+        exclude: Extra .gitignore-style patterns of files/folders to leave out
+        include: Only flatten files matching one of these patterns
+        chunk_size: Stream files larger than this many bytes in chunks
+        save_profile: Save profile used for rewritten sections and the save
+    """
+    from docx import Document
+
+    settings = SAVE_PROFILES[save_profile]
+    doc = Document(output_file)
+    style_id = code_style_id(doc) if settings['shared_style'] else None
+    index = read_index_part(doc)
+    old_hashes = {entry['path']: entry['hash'] for entry in index or []}
+    sections = locate_sections(doc, index)
+
+    # Without an index entry (the index part was dropped by another editor,
+    # or the document predates it) use the hash in the section's FILE marker
+    for path, elements in sections.items():
+        if path not in old_hashes:
+            marker = parse_file_marker(paragraph_text(elements[0]))
+            if marker and marker[1]:
+                old_hashes[path] = marker[1]['hash']
+
+    for p in doc.element.body.xpath('./w:p'):
+        if parse_ref_marker(paragraph_text(p)):
+            p.getparent().remove(p)
+
+    # New sections go after the previous file's section (or before the first
+    # existing section, or at the end of an otherwise empty document)
+    first_section = next(iter(sections.values()), None)
+    if first_section:
+        anchor = first_section[0].getprevious()
+    else:
+        anchor = doc.element.body.xpath('./w:p')[-1]
+
+    new_sections = []
+    files_added = 0
+    files_updated = 0
+    files_unchanged = 0
+    files_skipped = 0
+
+    files = iter_source_files(input_path, exclude=exclude, include=include, chunk_size=chunk_size)
+    for relative_path, content in files:
+        if content is None:
+            files_skipped += 1
+            continue
+
+        path = relative_path.as_posix()
+        digest = chunks_hash(content_chunks(content))
+        existing = sections.pop(path, None)
+
+        if existing is not None and old_hashes.get(path) == digest:
+            new_sections.append((path, existing, digest))
+            anchor = existing[-1]
+            files_unchanged += 1
+            continue
+
+        # Build the section at the end of the body, then move it into place
+        elements, _ = add_file_section(doc, path, content, style_id, settings['page_breaks'])
+        for element in elements:
+            anchor.addnext(element)
+            anchor = element
+
+        if existing is not None:
+            for element in existing:
+                element.getparent().remove(element)
+            files_updated += 1
+            print(f"  Updated: {relative_path}")
+        else:
+            files_added += 1
+            print(f"  Added: {relative_path}")
+
+        new_sections.append((path, elements, digest))
+
+    # Anything left no longer exists in the source directory
+    for path, elements in sections.items():
+        for element in elements:
+            element.getparent().remove(element)
+        print(f"  Removed: {path}")
+    files_removed = len(sections)
+
+    write_index_part(doc, build_index_entries(doc, new_sections))
+
+    output_path = Path(output_file)
+    save_document(doc, output_path, save_profile)
+
+    print(f"\n{'='*50}")
+    print(f"Update complete!")
+    print(f"  Files added:     {files_added}")
+    print(f"  Files updated:   {files_updated}")
+    print(f"  Files removed:   {files_removed}")
+    print(f"  Files unchanged: {files_unchanged}")
+    print(f"  Files skipped:   {files_skipped}")
     print(f"  Output: {output_path.absolute()}")
 
 
 def main():
     """Main entry point."""
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
     input_dir = os.getenv('INPUT_DIR')
     output_file = os.getenv('OUTPUT_FILE')
+    update = os.getenv('FLATTEN_UPDATE', '').lower() in ('1', 'true', 'yes')
+    max_volume_bytes = int(os.getenv('VOLUME_MAX_BYTES') or 0)
+    max_volume_pages = int(os.getenv('VOLUME_MAX_PAGES') or 0)
+    workers = int(os.getenv('VOLUME_WORKERS') or 0) or None
+    exclude = parse_path_list(os.getenv('FLATTEN_EXCLUDE'))
+    include = parse_path_list(os.getenv('FLATTEN_INCLUDE'))
+    chunk_size = int(os.getenv('FLATTEN_CHUNK_SIZE') or DEFAULT_CHUNK_SIZE)
+    dedup = os.getenv('FLATTEN_DEDUP', '').lower() in ('1', 'true', 'yes')
+    save_profile = os.getenv('FLATTEN_SAVE_PROFILE') or DEFAULT_SAVE_PROFILE
 
     if not input_dir:
         raise ValueError("INPUT_DIR not set in .env file")
@@ -165,9 +1098,20 @@ def main():
     print(f"{'='*50}")
     print(f"Input:  {input_dir}")
     print(f"Output: {output_file}")
+    if update:
+        print(f"Mode:   update (only changed files are re-written)")
+    if max_volume_bytes or max_volume_pages:
+        print(f"Mode:   volumes (max {max_volume_bytes or '-'} bytes, {max_volume_pages or '-'} pages)")
+    if dedup:
+        print(f"Mode:   dedup (identical files are written once)")
+    if save_profile != DEFAULT_SAVE_PROFILE:
+        print(f"Save:   {save_profile} profile")
     print(f"{'='*50}\n")
 
-    flatten_directory_to_word(input_dir, output_file)
+    flatten_directory_to_word(
+        input_dir, output_file, update, max_volume_bytes, max_volume_pages, workers, exclude, include,
+        chunk_size, dedup, save_profile
+    )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,326 @@
+"""
+Shared Format Helpers for Flattened Documents
+
+Definitions used by both directory_flattener.py and restore_from_word.py.
+The flattener embeds a file index as a custom XML part inside the .docx so the
+restorer can jump straight to the paragraphs of the files it needs instead of
+scanning the whole document. Content hashing and the size/mtime hash cache
+used for incremental restores also live here, as do the plain-text bundle
+backend's markers.
+"""
+
+import hashlib
+import json
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+
+# File delimiter markers (used for flattening and parsing back)
+FILE_START_MARKER = "═══ FILE: {path} ═══"
+FILE_START_PATTERN = r"═══ FILE: (.+?) ═══"
+FILE_END_MARKER = "═══ END FILE ═══"
+
+# Optional frame appended after a FILE marker: the number of body lines
+# (content paragraphs in a Word document), the content's UTF-8 byte length and
+# its SHA-256. Readers that only know FILE_START_PATTERN still find the path.
+FILE_FRAME = " lines={lines} bytes={bytes} sha256={hash}"
+FILE_MARKER_PATTERN = r"═══ FILE: (.+?) ═══(?: lines=(\d+) bytes=(\d+) sha256=([0-9a-f]{64}))?$"
+
+# Written in dedup mode instead of a full section when a file's content is
+# identical to an earlier file's; restorers copy the earlier file's content.
+# Readers that only know FILE markers ignore it.
+FILE_REF_MARKER = "═══ REF: {path} ═══ SAME AS: {source}"
+FILE_REF_PATTERN = r"═══ REF: (.+?) ═══ SAME AS: (.+)$"
+
+# Plain-text bundle backend, chosen by output extension: the same FILE markers
+# around each file's raw bytes, with no Word/zip container
+BUNDLE_EXTENSIONS = {'.txt', '.pbibundle'}
+BUNDLE_MARKER_PREFIX = "═══ ".encode('utf-8')
+BUNDLE_END_SEPARATOR = b'\n' + FILE_END_MARKER.encode('utf-8') + b'\n'
+
+# Volume output: MyReport.docx -> MyReport_vol001.docx ... + MyReport.manifest.json
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+
+# Custom XML part holding the file index
+INDEX_PARTNAME = "/customXml/pbiFileIndex.xml"
+INDEX_NAMESPACE = "urn:power-bi-agent-kb:file-index"
+INDEX_VERSION = "1"
+INDEX_CONTENT_TYPE = "application/xml"
+INDEX_RELTYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/customXml"
+
+
+def parse_path_list(value: str | None) -> list[str] | None:
+    """Split a comma or semicolon separated list of paths/patterns (as set in .env)."""
+    if not value:
+        return None
+    items = [item.strip().replace('\\', '/') for item in re.split(r'[,;]', value)]
+    return [item for item in items if item] or None
+
+
+def format_file_marker(path: str, frame: dict | None = None) -> str:
+    """Return the FILE start marker for a path, framed if a frame is given."""
+    marker = FILE_START_MARKER.format(path=path)
+    return marker + FILE_FRAME.format(**frame) if frame else marker
+
+
+def parse_file_marker(text: str) -> tuple[str, dict | None] | None:
+    """
+    Parse a FILE start marker.
+
+    Returns:
+        Tuple of (path, frame dict or None for unframed markers), or None if
+        the text is not a FILE marker
+    """
+    match = re.match(FILE_MARKER_PATTERN, text)
+    if not match:
+        # Unframed or unusual marker: fall back to the path-only pattern
+        match = re.match(FILE_START_PATTERN, text)
+        return (match.group(1), None) if match else None
+
+    path, lines, size, digest = match.groups()
+    if lines is None:
+        return path, None
+    return path, {'lines': int(lines), 'bytes': int(size), 'hash': digest}
+
+
+def format_ref_marker(path: str, source: str) -> str:
+    """Return the reference marker for a duplicate of an earlier file."""
+    return FILE_REF_MARKER.format(path=path, source=source)
+
+
+def parse_ref_marker(text: str) -> tuple[str, str] | None:
+    """
+    Parse a reference marker.
+
+    Returns:
+        Tuple of (path, source path), or None if the text is not a reference
+    """
+    match = re.match(FILE_REF_PATTERN, text)
+    return (match.group(1), match.group(2)) if match else None
+
+
+def check_frame(content: str | bytes, frame: dict) -> bool:
+    """Check that content still matches the byte length and hash in its frame."""
+    data = content if isinstance(content, bytes) else content.encode('utf-8')
+    return len(data) == frame['bytes'] and bytes_hash(data) == frame['hash']
+
+
+def chunks_frame(chunks) -> dict:
+    """
+    Return the frame (lines, bytes, hash) of text streamed as newline-separated
+    chunks, matching the content '\\n'.join(chunks) without joining them.
+    Each chunk counts as one line (one paragraph in a Word document).
+    """
+    digest = hashlib.sha256()
+    lines = 0
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        if lines:
+            digest.update(b'\n')
+            size += 1
+        digest.update(data)
+        size += len(data)
+        lines += 1
+    return {'lines': lines, 'bytes': size, 'hash': digest.hexdigest()}
+
+
+def chunks_hash(chunks) -> str:
+    """Return the content hash of text streamed as newline-separated chunks."""
+    return chunks_frame(chunks)['hash']
+
+
+def file_frame(file_path: Path, chunk_size: int = 1024 * 1024) -> dict:
+    """Return the frame (lines, bytes, hash) of a file's raw bytes, read in chunks."""
+    digest = hashlib.sha256()
+    lines = 1
+    size = 0
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+            lines += chunk.count(b'\n')
+            size += len(chunk)
+    return {'lines': lines, 'bytes': size, 'hash': digest.hexdigest()}
+
+
+def bytes_hash(data: bytes) -> str:
+    """Return the SHA-256 hex digest of raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_hash_cache(cache_file: Path) -> dict:
+    """
+    Load a hash cache mapping relative paths to {size, mtime, hash}.
+
+    A missing or unreadable cache is treated as empty.
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_hash_cache(cache_file: Path, cache: dict) -> None:
+    """Write a hash cache produced by cached_file_hash()."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+
+
+def cached_file_hash(file_path: Path, key: str, cache: dict, stat=None) -> str:
+    """
+    Return a file's content hash, re-reading the file only when its size or
+    modification time differ from the cached entry.
+    """
+    stat = stat or file_path.stat()
+    entry = cache.get(key)
+    if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns:
+        return entry['hash']
+
+    digest = file_hash(file_path)
+    cache[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest}
+    return digest
+
+
+def is_bundle(path: str | Path) -> bool:
+    """Check whether an output/input path uses the plain-text bundle backend."""
+    return Path(path).suffix.lower() in BUNDLE_EXTENSIONS
+
+
+def volume_path_for(output_path: Path, number: int) -> Path:
+    """Return the path of volume `number` (1-based) for an output document."""
+    return output_path.with_name(f"{output_path.stem}_vol{number:03d}{output_path.suffix}")
+
+
+def manifest_path_for(output_path: Path) -> Path:
+    """Return the manifest path for a volume-split output document."""
+    return output_path.with_name(output_path.stem + MANIFEST_SUFFIX)
+
+
+def is_manifest(path: str | Path) -> bool:
+    """Check whether a path names a volume manifest rather than a document."""
+    return str(path).lower().endswith(MANIFEST_SUFFIX)
+
+
+def write_manifest(manifest_path: Path, manifest: dict) -> None:
+    """
+    Write a volume manifest.
+
+    The manifest dict has keys: source (flattened directory) and volumes (a
+    list of {file, files} dicts; file is relative to the manifest folder).
+    """
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, **manifest}, f, indent=2)
+
+
+def read_manifest(manifest_path: Path) -> dict:
+    """Read a volume manifest, resolving volume files to full paths."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if not isinstance(manifest.get('volumes'), list):
+        raise ValueError(f"Not a volume manifest: {manifest_path}")
+
+    for volume in manifest['volumes']:
+        volume['file'] = str(manifest_path.parent / volume['file'])
+    return manifest
+
+
+def build_index_xml(entries: list[dict]) -> bytes:
+    """
+    Serialise index entries to XML.
+
+    Each entry is a dict with keys: path, offset (paragraph index of the FILE
+    marker), length (number of content paragraphs) and hash (content SHA-256).
+    Duplicates written as references in dedup mode also have a source path;
+    their offset is that of the reference marker and their length is 0.
+    """
+    root = ET.Element(f"{{{INDEX_NAMESPACE}}}fileIndex", {'version': INDEX_VERSION})
+    for entry in entries:
+        attributes = {
+            'path': entry['path'],
+            'offset': str(entry['offset']),
+            'length': str(entry['length']),
+            'hash': entry['hash'],
+        }
+        if entry.get('source') is not None:
+            attributes['source'] = entry['source']
+        ET.SubElement(root, f"{{{INDEX_NAMESPACE}}}file", attributes)
+    ET.register_namespace('', INDEX_NAMESPACE)
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+
+def parse_index_xml(blob: bytes) -> list[dict]:
+    """Parse index XML produced by build_index_xml() back into entries."""
+    root = ET.fromstring(blob)
+    entries = []
+    for elem in root.iter(f"{{{INDEX_NAMESPACE}}}file"):
+        entry = {
+            'path': elem.get('path'),
+            'offset': int(elem.get('offset')),
+            'length': int(elem.get('length')),
+            'hash': elem.get('hash'),
+        }
+        if elem.get('source') is not None:
+            entry['source'] = elem.get('source')
+        entries.append(entry)
+    return entries
+
+
+def find_index_part(doc):
+    """
+    Return the custom XML part holding a Document's file index, or None.
+
+    The part is recognised by the namespace of its root element rather than
+    by INDEX_PARTNAME, because saving the document in another editor may
+    rename custom XML parts.
+    """
+    for rel in doc.part.rels.values():
+        if rel.reltype != INDEX_RELTYPE or rel.is_external:
+            continue
+        try:
+            root = ET.fromstring(rel.target_part.blob)
+        except ET.ParseError:
+            continue
+        if root.tag == f"{{{INDEX_NAMESPACE}}}fileIndex":
+            return rel.target_part
+    return None
+
+
+def write_index_part(doc, entries: list[dict]) -> None:
+    """Embed the file index in a python-docx Document as a custom XML part."""
+    from docx.opc.packuri import PackURI
+    from docx.opc.part import Part
+
+    document_part = doc.part
+    blob = build_index_xml(entries)
+
+    # Replace an existing index rather than adding a second one
+    existing = find_index_part(doc)
+    if existing is not None:
+        existing._blob = blob
+        return
+
+    part = Part(PackURI(INDEX_PARTNAME), INDEX_CONTENT_TYPE, blob, document_part.package)
+    document_part.relate_to(part, INDEX_RELTYPE)
+
+
+def read_index_part(doc) -> list[dict] | None:
+    """Return the embedded file index of a Document, or None if it has none."""
+    part = find_index_part(doc)
+    return parse_index_xml(part.blob) if part is not None else None
+    return None
@@ -0,0 +1,354 @@
+"""
+Layout Search for the Power BI Report Reformatter
+
+Instead of applying the one fixed dashboard template, generates candidate
+layouts for a page (slicer sidebar or strip, KPI row height, chart grid
+shape, tables as a bottom row, stacked or in a right-hand column, other
+visuals in the chart grid or in a row of their own) and keeps the one with
+the lowest score. Scores penalise:
+
+- visuals that overlap or leave the page
+- visuals below their type's minimum size or far from its preferred aspect ratio
+- unused space on the page
+- a reading order that does not run slicers/KPIs -> charts -> tables
+
+Candidates are scored cheapest term first and abandoned as soon as their
+partial score can no longer beat the best so far. The search stops at a
+per-page time budget, and the fixed template is always the first candidate,
+so the result is never scored worse than it. Pages are searched in parallel
+processes.
+"""
+
+import itertools
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from report_reformatter import (
+    GAP, KPI_HEIGHT, LAYOUT_SEARCH_BUDGET_MS, MARGIN, PAGE_HEIGHT, PAGE_WIDTH, SLICER_WIDTH,
+    calculate_dashboard_layout, snap_to_grid,
+)
+
+
+# Height of the slicer strip when slicers go across the top
+SLICER_STRIP_HEIGHT = 80
+
+# Height of the row used for "other" visuals when they get a row of their own
+OTHER_ROW_HEIGHT = 160
+
+# Candidate options
+KPI_HEIGHTS = [100, KPI_HEIGHT, 140]
+TABLE_ROW_SHARES = [0.3, 0.4, 0.5]      # Share of the body height for bottom tables
+TABLE_COLUMN_SHARES = [0.35, 0.45]      # Share of the body width for right-hand tables
+MAX_GRID_COLUMNS = 4
+
+# Preferred width/height ratio and minimum (width, height) per visual category
+IDEAL_ASPECT = {'slicer': 1.5, 'kpi': 2.5, 'chart': 1.6, 'table': 2.0, 'other': 1.6}
+MIN_SIZE = {
+    'slicer': (120, 60), 'kpi': (120, 80), 'chart': (200, 150),
+    'table': (250, 150), 'other': (100, 60),
+}
+
+# Reading order: lower priorities should be read (top-to-bottom, left-to-right) first
+READING_PRIORITY = {'slicer': 0, 'kpi': 1, 'chart': 2, 'other': 2, 'table': 3}
+
+# Score weights
+OFF_PAGE_PENALTY = 1000     # Per visual outside the page
+OVERLAP_PENALTY = 1000      # Per overlapping pair, plus the overlapping share of the page
+UNDERSIZE_PENALTY = 5       # Per visual below its minimum size
+ASPECT_WEIGHT = 1.0         # Times the mean |log(aspect / ideal aspect)|
+WHITESPACE_WEIGHT = 2.0     # Times the unused share of the content area
+READING_ORDER_WEIGHT = 3.0  # Times the share of visual pairs read out of order
+
+# Group keys used by group_visuals_by_type() and their categories
+GROUP_CATEGORIES = {
+    'slicers': 'slicer', 'kpis': 'kpi', 'charts': 'chart', 'tables': 'table', 'other': 'other',
+}
+
+
+def grid_cells(count: int, region: tuple, cols: int) -> list[tuple]:
+    """
+    Split a region (x, y, width, height) into count cells, cols per row.
+    A short last row is stretched to the full width.
+    """
+    x, y, width, height = region
+    cols = max(1, min(cols, count))
+    rows = -(-count // cols)
+    cell_height = (height - (rows - 1) * GAP) / rows
+
+    cells = []
+    for row in range(rows):
+        in_row = min(cols, count - row * cols)
+        cell_width = (width - (in_row - 1) * GAP) / in_row
+        for col in range(in_row):
+            cells.append((x + col * (cell_width + GAP), y + row * (cell_height + GAP), cell_width, cell_height))
+    return cells
+
+
+def candidate_options(grouped_visuals: dict):
+    """Yield option dicts for every candidate layout worth trying for a page."""
+    counts = {key: len(grouped_visuals.get(key, [])) for key in GROUP_CATEGORIES}
+
+    slicer_modes = ['left', 'top'] if counts['slicers'] else [None]
+    kpi_heights = KPI_HEIGHTS if counts['kpis'] else [None]
+    other_modes = ['grid', 'row'] if counts['other'] and counts['charts'] else ['grid']
+
+    table_modes = [(None, None)]
+    if counts['tables']:
+        table_modes = [('row', share) for share in TABLE_ROW_SHARES]
+        if counts['tables'] >= 3:
+            table_modes += [('stack', share) for share in TABLE_ROW_SHARES]
+        table_modes += [('right', share) for share in TABLE_COLUMN_SHARES]
+
+    for slicer_mode, kpi_height, other_mode, (table_mode, table_share) in itertools.product(
+            slicer_modes, kpi_heights, other_modes, table_modes):
+        grid_count = counts['charts'] + (counts['other'] if other_mode == 'grid' else 0)
+        for cols in range(1, min(grid_count, MAX_GRID_COLUMNS) + 1) if grid_count else [1]:
+            yield {
+                'slicers': slicer_mode, 'kpi_height': kpi_height, 'other': other_mode,
+                'tables': table_mode, 'table_share': table_share, 'cols': cols,
+            }
+
+
+def build_layout(grouped_visuals: dict, page_width: int, page_height: int, options: dict) -> dict | None:
+    """
+    Build the layout described by a candidate's options.
+
+    Returns:
+        Dict mapping visual name to position dict (as calculate_dashboard_layout
+        returns), or None if the options leave no room for some visual
+    """
+    names = {key: [v['name'] for v in grouped_visuals.get(key, [])] for key in GROUP_CATEGORIES}
+    left, top = MARGIN, MARGIN
+    right, bottom = page_width - MARGIN, page_height - MARGIN
+    rects = {}
+
+    def place(visual_names, cells):
+        rects.update(zip(visual_names, cells))
+
+    if names['slicers']:
+        if options['slicers'] == 'left':
+            place(names['slicers'], grid_cells(len(names['slicers']), (left, top, SLICER_WIDTH, bottom - top), 1))
+            left += SLICER_WIDTH + GAP
+        else:
+            strip = (left, top, right - left, SLICER_STRIP_HEIGHT)
+            place(names['slicers'], grid_cells(len(names['slicers']), strip, len(names['slicers'])))
+            top += SLICER_STRIP_HEIGHT + GAP
+
+    if names['kpis']:
+        row = (left, top, right - left, options['kpi_height'])
+        place(names['kpis'], grid_cells(len(names['kpis']), row, len(names['kpis'])))
+        top += options['kpi_height'] + GAP
+
+    if names['tables']:
+        count = len(names['tables'])
+        if options['tables'] == 'right':
+            width = (right - left) * options['table_share']
+            place(names['tables'], grid_cells(count, (right - width, top, width, bottom - top), 1))
+            right -= width + GAP
+        else:
+            height = (bottom - top) * options['table_share']
+            cols = count if options['tables'] == 'row' else 2
+            place(names['tables'], grid_cells(count, (left, bottom - height, right - left, height), cols))
+            bottom -= height + GAP
+
+    grid = names['charts'] + (names['other'] if options['other'] == 'grid' else [])
+    if options['other'] == 'row':
+        height = min(OTHER_ROW_HEIGHT, (bottom - top) / 3)
+        place(names['other'], grid_cells(len(names['other']), (left, bottom - height, right - left, height),
+                                         len(names['other'])))
+        bottom -= height + GAP
+
+    if grid:
+        place(grid, grid_cells(len(grid), (left, top, right - left, bottom - top), options['cols']))
+
+    if any(width <= 0 or height <= 0 for _, _, width, height in rects.values()):
+        return None
+
+    # Tab order follows the reading order
+    ordered = sorted(rects, key=lambda name: (round(rects[name][1]), rects[name][0]))
+    return {
+        name: {
+            'x': snap_to_grid(rects[name][0]),
+            'y': snap_to_grid(rects[name][1]),
+            'z': i,
+            'width': snap_to_grid(rects[name][2]),
+            'height': snap_to_grid(rects[name][3]),
+            'tabOrder': i,
+        }
+        for i, name in enumerate(ordered)
+    }
+
+
+def score_layout(
+    positions: dict,
+    categories: dict,
+    page_width: int,
+    page_height: int,
+    bound: float = math.inf
+) -> float | None:
+    """
+    Score a layout (lower is better).
+
+    Terms are added cheapest first; once the partial score reaches bound the
+    layout cannot win and None is returned without computing the rest.
+    """
+    rects = [
+        (p['x'], p['y'], p['width'], p['height'], categories[name])
+        for name, p in positions.items()
+    ]
+    if not rects:
+        return 0.0
+
+    # Off-page, undersized and badly proportioned visuals
+    score = 0.0
+    aspect_error = 0.0
+    for x, y, width, height, category in rects:
+        if x < 0 or y < 0 or x + width > page_width or y + height > page_height:
+            score += OFF_PAGE_PENALTY
+        min_width, min_height = MIN_SIZE[category]
+        if width < min_width or height < min_height:
+            score += UNDERSIZE_PENALTY
+        if width > 0 and height > 0:
+            aspect_error += abs(math.log(width / height / IDEAL_ASPECT[category]))
+    score += ASPECT_WEIGHT * aspect_error / len(rects)
+    if score >= bound:
+        return None
+
+    # Unused share of the content area
+    content_area = (page_width - 2 * MARGIN) * (page_height - 2 * MARGIN)
+    covered = sum(width * height for _, _, width, height, _ in rects)
+    score += WHITESPACE_WEIGHT * max(0.0, 1 - covered / content_area)
+    if score >= bound:
+        return None
+
+    # Pairs of visuals read out of order
+    if len(rects) > 1:
+        ordered = sorted(rects, key=lambda r: (r[1], r[0]))
+        inversions = sum(
+            1
+            for i, earlier in enumerate(ordered)
+            for later in ordered[i + 1:]
+            if READING_PRIORITY[earlier[4]] > READING_PRIORITY[later[4]]
+        )
+        score += READING_ORDER_WEIGHT * inversions / (len(rects) * (len(rects) - 1) / 2)
+        if score >= bound:
+            return None
+
+    # Overlapping pairs (most expensive; well-formed candidates have none)
+    page_area = page_width * page_height
+    for i, (x1, y1, w1, h1, _) in enumerate(rects):
+        for x2, y2, w2, h2, _ in rects[i + 1:]:
+            overlap_width = min(x1 + w1, x2 + w2) - max(x1, x2)
+            overlap_height = min(y1 + h1, y2 + h2) - max(y1, y2)
+            if overlap_width > 0 and overlap_height > 0:
+                score += OVERLAP_PENALTY * (1 + overlap_width * overlap_height / page_area)
+                if score >= bound:
+                    return None
+
+    return score
+
+
+def search_dashboard_layout(
+    grouped_visuals: dict,
+    page_width: int = PAGE_WIDTH,
+    page_height: int = PAGE_HEIGHT,
+    budget_ms: int = LAYOUT_SEARCH_BUDGET_MS
+) -> tuple[dict, dict]:
+    """
+    Find the best-scoring layout for a page within a time budget.
+
+    Args:
+        grouped_visuals: Visuals grouped as by group_visuals_by_type()
+        page_width: Page width in pixels
+        page_height: Page height in pixels
+        budget_ms: Time allowed for the search, in milliseconds
+
+    Returns:
+        Tuple of (dict mapping visual name to new position dict, search stats
+        dict: candidates, pruned, score, elapsed_ms, template_won)
+    """
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000
+
+    categories = {
+        v['name']: category
+        for key, category in GROUP_CATEGORIES.items()
+        for v in grouped_visuals.get(key, [])
+    }
+
+    best = calculate_dashboard_layout(grouped_visuals, page_width, page_height)
+    best_score = score_layout(best, categories, page_width, page_height)
+    template_won = True
+    candidates = 1
+    pruned = 0
+    seen = set()
+
+    for options in candidate_options(grouped_visuals):
+        if time.perf_counter() >= deadline:
+            break
+
+        positions = build_layout(grouped_visuals, page_width, page_height, options)
+        candidates += 1
+        if positions is None:
+            pruned += 1
+            continue
+
+        # Different options can snap to the same geometry
+        key = tuple(sorted((name, p['x'], p['y'], p['width'], p['height']) for name, p in positions.items()))
+        if key in seen:
+            pruned += 1
+            continue
+        seen.add(key)
+
+        score = score_layout(positions, categories, page_width, page_height, best_score)
+        if score is None:
+            pruned += 1
+            continue
+
+        best, best_score = positions, score
+        template_won = False
+
+    stats = {
+        'candidates': candidates,
+        'pruned': pruned,
+        'score': best_score,
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+        'template_won': template_won,
+    }
+    return best, stats
+
+
+def search_page_layouts(
+    pages: list[tuple[dict, int, int]],
+    budget_ms: int = LAYOUT_SEARCH_BUDGET_MS,
+    workers: int | None = None
+) -> list[tuple[dict, dict]]:
+    """
+    Search layouts for several pages in parallel processes.
+
+    Args:
+        pages: List of (grouped visuals, page width, page height) tuples
+        budget_ms: Time allowed per page, in milliseconds
+        workers: Number of processes (default: CPU count)
+
+    Returns:
+        One (positions, stats) tuple per page, as search_dashboard_layout() returns
+    """
+    # Only visual names are needed, which keeps what is sent to workers small
+    slim_pages = [
+        ({key: [{'name': v['name']} for v in visuals] for key, visuals in grouped.items()}, width, height)
+        for grouped, width, height in pages
+    ]
+
+    if len(slim_pages) <= 1:
+        return [search_dashboard_layout(grouped, width, height, budget_ms) for grouped, width, height in slim_pages]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            search_dashboard_layout,
+            [grouped for grouped, _, _ in slim_pages],
+            [width for _, width, _ in slim_pages],
+            [height for _, _, height in slim_pages],
+            [budget_ms] * len(slim_pages),
+        ))
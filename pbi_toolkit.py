@@ -0,0 +1,129 @@
+"""
+Power BI Toolkit Command Line
+
+Single entry point for the toolkit scripts:
+
+    python pbi_toolkit.py flatten   --input MyReport.Report --output MyReport.docx
+    python pbi_toolkit.py restore   --input MyReport.docx --output MyReport.Report
+    python pbi_toolkit.py reformat  --input MyReport.Report
+    python pbi_toolkit.py verify    --input MyReport.Report --backend bundle
+    python pbi_toolkit.py validate  --input MyReport_reformatted.Report
+    python pbi_toolkit.py catalog   --roots C:/Reports --query "SELECT ..."
+    python pbi_toolkit.py bench
+
+Every option falls back to the matching .env setting, so running a subcommand
+without options behaves exactly like running its script. Each subcommand's
+module (and python-docx / python-dotenv with it) is only imported once that
+subcommand runs, which keeps --help and reformat quick to start.
+"""
+
+import argparse
+import importlib
+import os
+
+
+# Subcommand -> (module run, help text, options as (flag, .env setting, kind, help))
+# Kinds: 'value' takes an argument, 'flag' is a switch that sets the setting to true
+SUBCOMMANDS = {
+    'flatten': ('directory_flattener', "Flatten a folder into a Word document or bundle", [
+        ('--input', 'INPUT_DIR', 'value', "Folder to flatten"),
+        ('--output', 'OUTPUT_FILE', 'value', "Output .docx (or .txt/.pbibundle for a bundle)"),
+        ('--update', 'FLATTEN_UPDATE', 'flag', "Only rewrite sections of changed files"),
+        ('--dedup', 'FLATTEN_DEDUP', 'flag', "Write identical files once, as references"),
+        ('--max-volume-bytes', 'VOLUME_MAX_BYTES', 'value', "Split into volumes of at most this many .docx bytes"),
+        ('--max-volume-pages', 'VOLUME_MAX_PAGES', 'value', "Split into volumes of roughly this many pages"),
+        ('--workers', 'VOLUME_WORKERS', 'value', "Processes used to build volumes"),
+        ('--exclude', 'FLATTEN_EXCLUDE', 'value', "Comma separated .gitignore-style patterns to leave out"),
+        ('--include', 'FLATTEN_INCLUDE', 'value', "Comma separated patterns of files to keep"),
+        ('--chunk-size', 'FLATTEN_CHUNK_SIZE', 'value', "Stream files larger than this many bytes in chunks"),
+        ('--save-profile', 'FLATTEN_SAVE_PROFILE', 'value', "Word save profile: standard, fast or store"),
+    ]),
+    'restore': ('restore_from_word', "Restore a folder from a flattened document", [
+        ('--input', 'INPUT_WORD_DOC', 'value', "Flattened .docx, volume manifest or bundle"),
+        ('--output', 'OUTPUT_REPORT_DIR', 'value', "Folder to restore into"),
+        ('--files', 'RESTORE_FILES', 'value', "Comma separated paths or glob patterns to restore"),
+        ('--incremental', 'RESTORE_INCREMENTAL', 'flag', "Only write files whose content changed"),
+        ('--strict', 'RESTORE_STRICT', 'flag', "Refuse files that no longer match their FILE marker"),
+        ('--workers', 'VOLUME_WORKERS', 'value', "Processes used to parse volumes"),
+    ]),
+    'reformat': ('report_reformatter', "Apply the theme and dashboard layout to a report", [
+        ('--input', 'INPUT_DIR', 'value', "Source .Report folder"),
+        ('--output', 'OUTPUT_REPORT_DIR', 'value', "Output .Report folder (batch mode: output folder)"),
+        ('--catalog', 'REFORMAT_CATALOG', 'value', "Reformat every catalogued report (overrides INPUT_DIR in .env)"),
+        ('--visual-type', 'REFORMAT_VISUAL_TYPE', 'value', "Batch mode: only reports using this visual type"),
+        ('--layout-search', 'LAYOUT_SEARCH', 'flag', "Keep the best of several candidate layouts per page"),
+        ('--search-budget-ms', 'LAYOUT_SEARCH_BUDGET_MS', 'value', "Time allowed per page for the layout search"),
+        ('--workers', 'LAYOUT_WORKERS', 'value', "Processes used to search pages and validate"),
+        ('--skip-validation', 'REFORMAT_SKIP_VALIDATION', 'flag', "Do not validate the output"),
+    ]),
+    'validate': ('report_validator', "Check a report against the bundled PBIR schemas and its layouts", [
+        ('--input', 'VALIDATE_REPORT_DIR', 'value', "Report folder to check (default OUTPUT_REPORT_DIR)"),
+        ('--workers', 'VALIDATE_WORKERS', 'value', "Processes used for large reports"),
+    ]),
+    'verify': ('verify_roundtrip', "Check that flatten -> restore reproduces a folder", [
+        ('--input', 'INPUT_DIR', 'value', "Folder to verify"),
+        ('--backend', 'VERIFY_BACKEND', 'value', "docx (default) or bundle"),
+        ('--workers', 'VERIFY_WORKERS', 'value', "Threads used for hashing"),
+        ('--exclude', 'FLATTEN_EXCLUDE', 'value', "Comma separated .gitignore-style patterns to leave out"),
+        ('--include', 'FLATTEN_INCLUDE', 'value', "Comma separated patterns of files to keep"),
+        ('--chunk-size', 'FLATTEN_CHUNK_SIZE', 'value', "Chunk size passed to the flattener"),
+    ]),
+    'catalog': ('report_catalog', "Index reports into a SQLite catalog and query it", [
+        ('--db', 'CATALOG_DB', 'value', "Catalog database file (default pbi_catalog.sqlite)"),
+        ('--roots', 'CATALOG_ROOTS', 'value', "Comma separated folders searched for .Report folders"),
+        ('--query', 'CATALOG_QUERY', 'value', "SQL query to run against the catalog"),
+    ]),
+    'bench': ('benchmark', "Time the flatten/restore backends, save profiles and tool start-up", [
+        ('--input', 'BENCH_INPUT_DIR', 'value', "Report folder to benchmark (default: synthetic)"),
+    ]),
+}
+
+# (subcommand, setting) given on the command line -> settings it replaces.
+# Those are blanked unless also given, so .env values (which load_dotenv never
+# puts over an existing variable) cannot take precedence over the option
+REPLACED_SETTINGS = {
+    ('reformat', 'REFORMAT_CATALOG'): ['INPUT_DIR'],
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one subparser per subcommand."""
+    parser = argparse.ArgumentParser(
+        prog='pbi_toolkit',
+        description="Power BI report toolkit. Options not given fall back to the .env file.",
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    for name, (_, help_text, options) in SUBCOMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        for flag, setting, kind, option_help in options:
+            if kind == 'flag':
+                subparser.add_argument(flag, dest=setting, action='store_true', default=None,
+                                       help=f"{option_help} ({setting})")
+            else:
+                subparser.add_argument(flag, dest=setting, metavar='VALUE',
+                                       help=f"{option_help} ({setting})")
+
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    """Main entry point."""
+    args = build_parser().parse_args(argv)
+    module_name, _, options = SUBCOMMANDS[args.command]
+
+    # Options given on the command line override .env (load_dotenv never
+    # replaces variables that are already set)
+    for _, setting, kind, _ in options:
+        value = getattr(args, setting)
+        if value is not None:
+            os.environ[setting] = 'true' if kind == 'flag' else value
+            for replaced in REPLACED_SETTINGS.get((args.command, setting), []):
+                if getattr(args, replaced) is None:
+                    os.environ[replaced] = ''
+
+    importlib.import_module(module_name).main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,417 @@
+"""
+Report Catalog for Power BI Projects
+
+Indexes every .Report folder under one or more root folders into a local
+SQLite database of reports, pages and visuals, so questions such as "which
+reports use waterfallChart?" or "which pages have more than 9 charts?" are a
+single query instead of a walk over every visual.json.
+
+Re-indexing is incremental: each indexed file's size, modification time and
+content hash are stored, so unchanged files are skipped without being read
+and touched-but-identical files without being parsed.
+"""
+
+import json
+import os
+import sqlite3
+from pathlib import Path, PurePosixPath
+
+from flatten_format import bytes_hash, parse_path_list
+from report_reformatter import categorize_visual, get_visual_type
+
+
+# Bump when the schema changes; older catalogs are rebuilt from scratch
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE reports (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    page_order TEXT NOT NULL DEFAULT '[]',
+    active_page TEXT
+);
+CREATE TABLE files (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (report_id, path)
+);
+CREATE TABLE pages (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    display_name TEXT,
+    width INTEGER,
+    height INTEGER,
+    ordinal INTEGER,
+    PRIMARY KEY (report_id, name)
+);
+CREATE TABLE visuals (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    file TEXT NOT NULL,
+    page_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    visual_type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    x REAL,
+    y REAL,
+    z REAL,
+    width REAL,
+    height REAL,
+    tab_order INTEGER,
+    PRIMARY KEY (report_id, file)
+);
+CREATE INDEX visuals_by_type ON visuals (visual_type);
+CREATE INDEX visuals_by_page ON visuals (report_id, page_name, category);
+"""
+
+DEFAULT_CATALOG_FILE = "pbi_catalog.sqlite"
+
+# Report-relative location of the page list
+PAGES_JSON = "definition/pages/pages.json"
+
+# Folders never searched for reports
+SKIP_FOLDERS = {'.git', 'node_modules', '__pycache__', '.venv'}
+
+
+def open_catalog(db_path: str) -> sqlite3.Connection:
+    """Open (creating or rebuilding if needed) a catalog database."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            conn.execute(f'DROP TABLE "{table}"')
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+
+    return conn
+
+
+def find_reports(root: Path) -> list[Path]:
+    """Return every .Report folder at or below root, in sorted order."""
+    if root.suffix == '.Report':
+        return [root]
+
+    reports = []
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames.sort()
+        for dirname in list(dirnames):
+            if dirname in SKIP_FOLDERS:
+                dirnames.remove(dirname)
+            elif dirname.endswith('.Report'):
+                reports.append(Path(dirpath) / dirname)
+                # A report's own folders never hold further reports
+                dirnames.remove(dirname)
+    return reports
+
+
+def iter_report_files(report_path: Path):
+    """
+    Yield (relative posix path, file path) for the catalogued files of a
+    report: pages.json first, then each page.json followed by its visuals.
+    """
+    pages_dir = report_path / "definition" / "pages"
+    if not pages_dir.is_dir():
+        return
+
+    pages_json = pages_dir / "pages.json"
+    if pages_json.is_file():
+        yield PAGES_JSON, pages_json
+
+    for page_dir in sorted(pages_dir.iterdir()):
+        if not page_dir.is_dir():
+            continue
+        page_file = page_dir / "page.json"
+        if page_file.is_file():
+            yield page_file.relative_to(report_path).as_posix(), page_file
+
+        visuals_dir = page_dir / "visuals"
+        if not visuals_dir.is_dir():
+            continue
+        for visual_dir in sorted(visuals_dir.iterdir()):
+            visual_file = visual_dir / "visual.json"
+            if visual_file.is_file():
+                yield visual_file.relative_to(report_path).as_posix(), visual_file
+
+
+def index_file(conn: sqlite3.Connection, report_id: int, relative_path: str, data: dict) -> None:
+    """Store the catalog rows for one parsed report file, replacing any old ones."""
+    parts = PurePosixPath(relative_path).parts
+
+    if relative_path == PAGES_JSON:
+        conn.execute(
+            "UPDATE reports SET page_order = ?, active_page = ? WHERE id = ?",
+            (json.dumps(data.get('pageOrder', [])), data.get('activePageName'), report_id)
+        )
+    elif parts[-1] == 'page.json':
+        page_name = parts[-2]
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (report_id, name, display_name, width, height) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (report_id, page_name, data.get('displayName', page_name), data.get('width'), data.get('height'))
+        )
+    elif parts[-1] == 'visual.json':
+        visual_type = get_visual_type(data)
+        position = data.get('position', {})
+        conn.execute(
+            "INSERT OR REPLACE INTO visuals (report_id, file, page_name, name, visual_type, category, "
+            "x, y, z, width, height, tab_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                report_id, relative_path, parts[-4], data.get('name', parts[-2]),
+                visual_type, categorize_visual(visual_type),
+                position.get('x'), position.get('y'), position.get('z'),
+                position.get('width'), position.get('height'), position.get('tabOrder'),
+            )
+        )
+
+
+def remove_file(conn: sqlite3.Connection, report_id: int, relative_path: str) -> None:
+    """Remove the catalog rows that came from one report file."""
+    parts = PurePosixPath(relative_path).parts
+
+    if relative_path == PAGES_JSON:
+        conn.execute("UPDATE reports SET page_order = '[]', active_page = NULL WHERE id = ?", (report_id,))
+    elif parts[-1] == 'page.json':
+        conn.execute("DELETE FROM pages WHERE report_id = ? AND name = ?", (report_id, parts[-2]))
+    elif parts[-1] == 'visual.json':
+        conn.execute("DELETE FROM visuals WHERE report_id = ? AND file = ?", (report_id, relative_path))
+
+
+def update_page_order(conn: sqlite3.Connection, report_id: int) -> None:
+    """Set each page's ordinal from the report's pages.json order."""
+    (page_order,) = conn.execute("SELECT page_order FROM reports WHERE id = ?", (report_id,)).fetchone()
+    conn.execute("UPDATE pages SET ordinal = NULL WHERE report_id = ?", (report_id,))
+    conn.executemany(
+        "UPDATE pages SET ordinal = ? WHERE report_id = ? AND name = ?",
+        [(i, report_id, name) for i, name in enumerate(json.loads(page_order))]
+    )
+
+
+def index_report(conn: sqlite3.Connection, report_path: Path) -> tuple[int, int, int]:
+    """
+    Index one .Report folder, skipping files whose size and modification time
+    (or, failing that, content hash) match what is already catalogued.
+
+    Returns:
+        Tuple of (files_indexed, files_unchanged, files_removed)
+    """
+    report_key = str(report_path.absolute())
+    conn.execute(
+        "INSERT INTO reports (path, name) VALUES (?, ?) ON CONFLICT (path) DO NOTHING",
+        (report_key, report_path.stem)
+    )
+    (report_id,) = conn.execute("SELECT id FROM reports WHERE path = ?", (report_key,)).fetchone()
+
+    known = {
+        row['path']: row
+        for row in conn.execute("SELECT path, size, mtime_ns, hash FROM files WHERE report_id = ?", (report_id,))
+    }
+
+    files_indexed = 0
+    files_unchanged = 0
+
+    for relative_path, file_path in iter_report_files(report_path):
+        stat = file_path.stat()
+        old = known.pop(relative_path, None)
+        if old is not None and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+            files_unchanged += 1
+            continue
+
+        raw = file_path.read_bytes()
+        digest = bytes_hash(raw)
+        conn.execute(
+            "INSERT OR REPLACE INTO files (report_id, path, size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?)",
+            (report_id, relative_path, stat.st_size, stat.st_mtime_ns, digest)
+        )
+        if old is not None and old['hash'] == digest:
+            # Touched but identical: only the recorded modification time changes
+            files_unchanged += 1
+            continue
+
+        remove_file(conn, report_id, relative_path)
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            print(f"  [INVALID JSON] {report_path.name}/{relative_path}: {e}")
+            continue
+        if isinstance(data, dict):
+            index_file(conn, report_id, relative_path, data)
+        files_indexed += 1
+
+    # Anything left no longer exists in the report folder
+    for relative_path in known:
+        remove_file(conn, report_id, relative_path)
+        conn.execute("DELETE FROM files WHERE report_id = ? AND path = ?", (report_id, relative_path))
+
+    if files_indexed or known:
+        update_page_order(conn, report_id)
+
+    return files_indexed, files_unchanged, len(known)
+
+
+def index_reports(db_path: str, roots: list[str]) -> None:
+    """
+    Index or refresh every .Report folder under the given roots.
+
+    Reports that were catalogued under one of the roots but no longer exist
+    are dropped from the catalog.
+
+    Args:
+        db_path: Catalog database file (created if missing)
+        roots: Folders searched for .Report folders (or .Report folders)
+    """
+    conn = open_catalog(db_path)
+    reports_indexed = 0
+    files_indexed = 0
+    files_unchanged = 0
+    files_removed = 0
+
+    try:
+        root_paths = [Path(root).absolute() for root in roots]
+        found = set()
+        for root in root_paths:
+            if not root.is_dir():
+                raise FileNotFoundError(f"Catalog root not found: {root}")
+
+            for report_path in find_reports(root):
+                found.add(str(report_path))
+                indexed, unchanged, removed = index_report(conn, report_path)
+                conn.commit()
+
+                reports_indexed += 1
+                files_indexed += indexed
+                files_unchanged += unchanged
+                files_removed += removed
+                if indexed or removed:
+                    print(f"  Indexed: {report_path.name} ({indexed} changed, {removed} removed)")
+
+        # Drop reports that disappeared from the searched roots
+        reports_dropped = 0
+        for row in conn.execute("SELECT id, path FROM reports").fetchall():
+            path = Path(row['path'])
+            if row['path'] not in found and any(path.is_relative_to(root) for root in root_paths):
+                conn.execute("DELETE FROM reports WHERE id = ?", (row['id'],))
+                reports_dropped += 1
+                print(f"  Dropped: {path.name}")
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"\n{'='*50}")
+    print(f"Catalog updated!")
+    print(f"  Reports:         {reports_indexed}")
+    print(f"  Reports dropped: {reports_dropped}")
+    print(f"  Files indexed:   {files_indexed}")
+    print(f"  Files unchanged: {files_unchanged}")
+    print(f"  Files removed:   {files_removed}")
+    print(f"  Catalog: {Path(db_path).absolute()}")
+
+
+def reports_using(conn: sqlite3.Connection, visual_type: str) -> list[sqlite3.Row]:
+    """Return the reports containing a visual type, with how many visuals of it each has."""
+    return conn.execute(
+        "SELECT r.name, r.path, COUNT(*) AS visuals FROM visuals v JOIN reports r ON r.id = v.report_id "
+        "WHERE v.visual_type = ? GROUP BY r.id ORDER BY r.name",
+        (visual_type,)
+    ).fetchall()
+
+
+def pages_with_more_than(conn: sqlite3.Connection, category: str, count: int) -> list[sqlite3.Row]:
+    """Return the pages with more than `count` visuals of a category (e.g. 'chart')."""
+    return conn.execute(
+        "SELECT r.name AS report, p.name AS page, p.display_name, COUNT(*) AS visuals "
+        "FROM visuals v JOIN reports r ON r.id = v.report_id "
+        "LEFT JOIN pages p ON p.report_id = v.report_id AND p.name = v.page_name "
+        "WHERE v.category = ? GROUP BY v.report_id, v.page_name HAVING COUNT(*) > ? "
+        "ORDER BY r.name, p.ordinal",
+        (category, count)
+    ).fetchall()
+
+
+def plan_reformat_batch(conn: sqlite3.Connection, visual_type: str | None = None) -> list[dict]:
+    """
+    Plan a batch reformat from the catalog, without scanning report folders.
+
+    Args:
+        conn: Open catalog
+        visual_type: Only include reports that contain this visual type
+
+    Returns:
+        One dict per report (largest first, so long runs start early): id,
+        path, name, pages (page names in report order) and visuals (total count)
+    """
+    query = (
+        "SELECT r.id, r.path, r.name, COUNT(v.file) AS visuals FROM reports r "
+        "LEFT JOIN visuals v ON v.report_id = r.id "
+    )
+    params = ()
+    if visual_type is not None:
+        query += "WHERE r.id IN (SELECT report_id FROM visuals WHERE visual_type = ?) "
+        params = (visual_type,)
+    query += "GROUP BY r.id ORDER BY visuals DESC, r.name"
+
+    plan = []
+    for row in conn.execute(query, params).fetchall():
+        if not Path(row['path']).is_dir():
+            continue
+        pages = [
+            page['name'] for page in conn.execute(
+                "SELECT name FROM pages WHERE report_id = ? ORDER BY ordinal IS NULL, ordinal, name",
+                (row['id'],)
+            )
+        ]
+        plan.append({'id': row['id'], 'path': row['path'], 'name': row['name'], 'pages': pages, 'visuals': row['visuals']})
+    return plan
+
+
+def print_query(conn: sqlite3.Connection, sql: str) -> None:
+    """Run an SQL query against the catalog and print the rows, tab separated."""
+    cursor = conn.execute(sql)
+    columns = [column[0] for column in cursor.description or []]
+    rows = cursor.fetchall()
+
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+    print(f"\n({len(rows)} rows)")
+
+
+def main():
+    """Main entry point."""
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    db_path = os.getenv('CATALOG_DB') or DEFAULT_CATALOG_FILE
+    roots = parse_path_list(os.getenv('CATALOG_ROOTS'))
+    query = os.getenv('CATALOG_QUERY')
+
+    if not roots and not query:
+        raise ValueError("CATALOG_ROOTS (or CATALOG_QUERY) not set in .env file")
+
+    print(f"Report Catalog")
+    print(f"{'='*50}")
+    print(f"Catalog: {db_path}")
+    if roots:
+        print(f"Roots:   {', '.join(roots)}")
+    print(f"{'='*50}\n")
+
+    if roots:
+        index_reports(db_path, roots)
+
+    if query:
+        print()
+        conn = open_catalog(db_path)
+        try:
+            print_query(conn, query)
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
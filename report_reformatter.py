@@ -11,11 +11,8 @@ import os
 import json
 import shutil
 from pathlib import Path
-from dotenv import load_dotenv
 from copy import deepcopy
 
-load_dotenv()
-
 # =============================================================================
 # LAYOUT CONSTANTS
 # =============================================================================
@@ -32,6 +29,8 @@ KPI_HEIGHT = 120     # Fixed height for KPI row
 SLICER_WIDTH = 200   # Fixed width for slicer sidebar
 TABLE_HEIGHT = 200   # Fixed height for table area
 
+LAYOUT_SEARCH_BUDGET_MS = 200   # Time allowed per page when searching layouts
+
 # =============================================================================
 # VISUAL TYPE CATEGORIES
 # =============================================================================
@@ -453,8 +452,15 @@ def process_theme_file(theme_data: dict) -> dict:
     return result
 
 
-def process_page(page_dir: Path) -> None:
-    """Process a single page - update layout and styling for all visuals."""
+def read_page(page_dir: Path) -> dict | None:
+    """
+    Read a page and its visuals.
+
+    Returns:
+        Dict with keys: name, display_name, width, height, visuals, visual_files
+        (visual name -> visual.json path) and grouped (visuals grouped by type),
+        or None if the page has no visuals
+    """
     page_name = page_dir.name
     print(f"\n  Processing page: {page_name}")
 
@@ -473,7 +479,7 @@ def process_page(page_dir: Path) -> None:
     visuals_dir = page_dir / "visuals"
     if not visuals_dir.exists():
         print(f"    No visuals folder found")
-        return
+        return None
 
     visuals = []
     visual_files = {}  # Map name to file path
@@ -489,7 +495,7 @@ def process_page(page_dir: Path) -> None:
 
     if not visuals:
         print(f"    No visuals found")
-        return
+        return None
 
     # Group visuals by type
     grouped = group_visuals_by_type(visuals)
@@ -498,14 +504,23 @@ def process_page(page_dir: Path) -> None:
           f"{len(grouped['charts'])} charts, {len(grouped['tables'])} tables, "
           f"{len(grouped['other'])} other")
 
-    # Calculate optimal layout
-    layout_positions = calculate_dashboard_layout(grouped, page_width, page_height)
+    return {
+        'name': page_name,
+        'display_name': display_name,
+        'width': page_width,
+        'height': page_height,
+        'visuals': visuals,
+        'visual_files': visual_files,
+        'grouped': grouped,
+    }
 
-    # Update each visual
-    for visual_data in visuals:
+
+def write_page_layout(page: dict, layout_positions: dict) -> None:
+    """Write new positions to the visual.json files of a page read by read_page()."""
+    for visual_data in page['visuals']:
         visual_name = visual_data.get('name', '')
         visual_type = get_visual_type(visual_data)
-        visual_file = visual_files.get(visual_name)
+        visual_file = page['visual_files'].get(visual_name)
 
         if not visual_file:
             continue
@@ -523,17 +538,59 @@ def process_page(page_dir: Path) -> None:
                   f"{new_position['width']}x{new_position['height']}")
 
 
+def process_page(page_dir: Path) -> None:
+    """Process a single page - update layout and styling for all visuals."""
+    page = read_page(page_dir)
+    if page is None:
+        return
+
+    # Calculate optimal layout
+    layout_positions = calculate_dashboard_layout(page['grouped'], page['width'], page['height'])
+
+    # Update each visual
+    write_page_layout(page, layout_positions)
+
+
+def search_pages(page_dirs: list[Path], budget_ms: int, workers: int | None = None) -> None:
+    """Lay out pages with the candidate search (see layout_search.py), pages in parallel."""
+    from layout_search import search_page_layouts
+
+    pages = [page for page in map(read_page, page_dirs) if page is not None]
+    results = search_page_layouts(
+        [(page['grouped'], page['width'], page['height']) for page in pages], budget_ms, workers
+    )
+
+    for page, (layout_positions, stats) in zip(pages, results):
+        source = "fixed template" if stats['template_won'] else "searched layout"
+        print(f"\n  Layout for {page['display_name']}: {source} (score {stats['score']:.2f}, "
+              f"{stats['candidates']} candidates, {stats['pruned']} pruned, {stats['elapsed_ms']:.0f}ms)")
+        write_page_layout(page, layout_positions)
+
+
 # =============================================================================
 # MAIN REFORMATTER
 # =============================================================================
 
-def reformat_report(input_dir: str, output_dir: str) -> None:
+def reformat_report(
+    input_dir: str,
+    output_dir: str,
+    layout_search: bool = False,
+    search_budget_ms: int = LAYOUT_SEARCH_BUDGET_MS,
+    workers: int | None = None,
+    validate: bool = True
+) -> None:
     """
     Main function to reformat a Power BI report.
 
     Args:
         input_dir: Path to the source .Report folder
         output_dir: Path to output the reformatted report
+        layout_search: Score several candidate layouts per page and keep the
+            best, instead of always applying the fixed dashboard template
+        search_budget_ms: Time allowed for the search on each page
+        workers: Number of processes used to search pages (default: CPU count)
+        validate: Check the output against the bundled PBIR schemas and for
+            overlapping or off-page visuals (see report_validator.py)
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
@@ -544,7 +601,10 @@ def reformat_report(input_dir: str, output_dir: str) -> None:
     print(f"  Input:  {input_path}")
     print(f"  Output: {output_path}")
     print(f"  Theme:  Corporate Blue")
-    print(f"  Layout: Slicers(left) | KPIs(top) | Charts(middle) | Tables(bottom)")
+    if layout_search:
+        print(f"  Layout: Best of candidate layouts ({search_budget_ms}ms per page)")
+    else:
+        print(f"  Layout: Slicers(left) | KPIs(top) | Charts(middle) | Tables(bottom)")
     print("=" * 65)
 
     if not input_path.exists():
@@ -556,7 +616,7 @@ def reformat_report(input_dir: str, output_dir: str) -> None:
     output_path.mkdir(parents=True)
 
     # === Step 1: Copy all files ===
-    print("\n[1/4] Copying source files...")
+    print("\n[1/5] Copying source files...")
     file_count = 0
     for item in input_path.rglob('*'):
         if item.is_file():
@@ -568,7 +628,7 @@ def reformat_report(input_dir: str, output_dir: str) -> None:
     print(f"    Copied {file_count} files")
 
     # === Step 2: Process pages and visuals ===
-    print("\n[2/4] Processing pages and layouts...")
+    print("\n[2/5] Processing pages and layouts...")
     pages_dir = output_path / "definition" / "pages"
 
     if pages_dir.exists():
@@ -581,12 +641,18 @@ def reformat_report(input_dir: str, output_dir: str) -> None:
             print(f"    Found {len(page_order)} pages")
 
         # Process each page
-        for page_dir in pages_dir.iterdir():
-            if page_dir.is_dir() and (page_dir / "page.json").exists():
+        page_dirs = [
+            page_dir for page_dir in pages_dir.iterdir()
+            if page_dir.is_dir() and (page_dir / "page.json").exists()
+        ]
+        if layout_search:
+            search_pages(page_dirs, search_budget_ms, workers)
+        else:
+            for page_dir in page_dirs:
                 process_page(page_dir)
 
     # === Step 3: Apply theme ===
-    print("\n[3/4] Applying Corporate Blue theme...")
+    print("\n[3/5] Applying Corporate Blue theme...")
     theme_path = output_path / "StaticResources" / "SharedResources" / "BaseThemes"
     if theme_path.exists():
         for theme_file in theme_path.glob("*.json"):
@@ -600,32 +666,112 @@ def reformat_report(input_dir: str, output_dir: str) -> None:
 
             print(f"    [OK] Updated: {theme_file.name}")
 
-    # === Step 4: Summary ===
-    print("\n[4/4] Finalizing...")
+    # === Step 4: Validate output ===
+    errors = []
+    warnings = []
+    if validate:
+        from report_validator import validate_report
+
+        print("\n[4/5] Validating output...")
+        errors, warnings = validate_report(str(output_path), workers)
+    else:
+        print("\n[4/5] Validation skipped")
+
+    # === Step 5: Summary ===
+    print("\n[5/5] Finalizing...")
     print("\n" + "=" * 65)
-    print("  REFORMATTING COMPLETE!")
+    print("  REFORMATTING COMPLETE!" if not errors else "  REFORMATTING COMPLETE - WITH SCHEMA ERRORS!")
     print("=" * 65)
     print(f"\n  Output: {output_path.absolute()}")
+    if validate:
+        print(f"  Validation: {len(errors)} schema errors, {len(warnings)} layout warnings")
     print("\n  Changes applied:")
     print("    - Corporate Blue color palette")
-    print("    - Dashboard layout (slicers left, KPIs top, etc.)")
+    if layout_search:
+        print("    - Best-scoring layout per page (overlap, whitespace, aspect, reading order)")
+    else:
+        print("    - Dashboard layout (slicers left, KPIs top, etc.)")
     print("    - Visual styling (rounded corners, shadows)")
     print("    - Grid-snapped positions (10px)")
     print("\n  Next: Open the output folder in Power BI Desktop")
     print("=" * 65)
 
 
+def reformat_batch(plan: list[dict], output_root: str | None = None, **options) -> None:
+    """
+    Reformat several reports, e.g. as planned by report_catalog.plan_reformat_batch().
+
+    Args:
+        plan: List of dicts with at least the path of each source .Report folder
+            (and optionally its catalog id)
+        output_root: Folder receiving every reformatted report (default: beside
+            each source report, as <name>_reformatted.Report). Reports sharing
+            a folder name get their catalog id (or position in the plan) added
+            to the output name, so one never overwrites another
+        options: Passed on to reformat_report() (layout search settings)
+    """
+    stems = [Path(entry['path']).stem for entry in plan]
+    output_paths = []
+    for i, entry in enumerate(plan, 1):
+        input_path = Path(entry['path'])
+        if not output_root:
+            output_paths.append(input_path.parent / (input_path.stem + "_reformatted.Report"))
+        elif stems.count(input_path.stem) > 1:
+            output_paths.append(Path(output_root) / f"{input_path.stem}_{entry.get('id', i)}_reformatted.Report")
+        else:
+            output_paths.append(Path(output_root) / (input_path.stem + "_reformatted.Report"))
+
+    if len(set(output_paths)) != len(output_paths):
+        raise ValueError("Batch reformat would write two reports to the same output folder")
+
+    for i, (entry, output_path) in enumerate(zip(plan, output_paths), 1):
+        input_path = Path(entry['path'])
+        print(f"\nReport {i} of {len(plan)}: {input_path.name} -> {output_path.name}")
+        reformat_report(str(input_path), str(output_path), **options)
+
+
 def main():
     """Main entry point."""
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
     input_dir = os.getenv('INPUT_DIR')
     output_dir = os.getenv('OUTPUT_REPORT_DIR')
+    catalog_db = os.getenv('REFORMAT_CATALOG')
+    layout_search = os.getenv('LAYOUT_SEARCH', '').lower() in ('1', 'true', 'yes')
+    search_budget_ms = int(os.getenv('LAYOUT_SEARCH_BUDGET_MS') or LAYOUT_SEARCH_BUDGET_MS)
+    workers = int(os.getenv('LAYOUT_WORKERS') or 0) or None
+    validate = os.getenv('REFORMAT_SKIP_VALIDATION', '').lower() not in ('1', 'true', 'yes')
+
+    # Batch mode: reformat every catalogued report (optionally only those using
+    # a visual type). A report set through INPUT_DIR takes precedence; the
+    # command line's --catalog clears an INPUT_DIR coming from .env
+    if catalog_db and input_dir:
+        print(f"INPUT_DIR is set - reformatting it only and ignoring REFORMAT_CATALOG ({catalog_db})\n")
+    elif catalog_db:
+        from report_catalog import open_catalog, plan_reformat_batch
+
+        conn = open_catalog(catalog_db)
+        try:
+            plan = plan_reformat_batch(conn, os.getenv('REFORMAT_VISUAL_TYPE') or None)
+        finally:
+            conn.close()
+        if not plan:
+            raise ValueError(f"No reports to reformat in catalog: {catalog_db}")
+        reformat_batch(
+            plan, output_dir,
+            layout_search=layout_search, search_budget_ms=search_budget_ms, workers=workers,
+            validate=validate
+        )
+        return
 
     if not input_dir:
         raise ValueError("INPUT_DIR not set in .env file")
     if not output_dir:
         output_dir = str(Path(input_dir).parent / (Path(input_dir).stem + "_reformatted.Report"))
 
-    reformat_report(input_dir, output_dir)
+    reformat_report(input_dir, output_dir, layout_search, search_budget_ms, workers, validate)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,321 @@
+"""
+Report Validator for Power BI Projects
+
+Checks a .Report folder (typically one just written by the reformatter)
+against the minimal PBIR JSON schemas bundled in schemas/: every
+visual.json, page.json and base theme file. It also checks each page's
+layout for visuals that overlap or fall outside the page. Catches what Power
+BI Desktop would otherwise only report when it refuses to open the report.
+
+Schemas are compiled once per process into plain validation functions (only
+the JSON Schema keywords the bundled schemas use are supported, so no
+schema library is needed), and large reports are validated in parallel.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+
+SCHEMA_DIR = Path(__file__).with_name("schemas")
+
+# Schema used for each kind of report file
+SCHEMA_FILES = {
+    'visual': "visualContainer.schema.json",
+    'page': "page.schema.json",
+    'theme': "theme.schema.json",
+}
+
+# Below this many files, validating in-process beats starting worker processes
+PARALLEL_MIN_FILES = 500
+BATCH_SIZE = 100
+
+JSON_TYPES = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'null': lambda v: v is None,
+}
+
+
+def compile_schema(schema: dict):
+    """
+    Compile a JSON schema into a function returning a list of error messages.
+
+    Supports: type, enum, required, properties, additionalProperties, items,
+    anyOf, minimum, minLength and pattern.
+    """
+    checks = []
+
+    if 'type' in schema:
+        types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        type_tests = [JSON_TYPES[t] for t in types]
+
+        def check_type(value, path):
+            if not any(test(value) for test in type_tests):
+                return [f"{path}: expected {' or '.join(types)}"]
+            return []
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+
+        def check_enum(value, path):
+            return [] if value in allowed else [f"{path}: must be one of {', '.join(map(str, allowed))}"]
+        checks.append(check_enum)
+
+    if 'minimum' in schema:
+        minimum = schema['minimum']
+
+        def check_minimum(value, path):
+            if JSON_TYPES['number'](value) and value < minimum:
+                return [f"{path}: must be at least {minimum}"]
+            return []
+        checks.append(check_minimum)
+
+    if 'minLength' in schema:
+        min_length = schema['minLength']
+
+        def check_min_length(value, path):
+            if isinstance(value, str) and len(value) < min_length:
+                return [f"{path}: must not be empty" if min_length == 1 else f"{path}: too short"]
+            return []
+        checks.append(check_min_length)
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+
+        def check_pattern(value, path):
+            if isinstance(value, str) and not pattern.search(value):
+                return [f"{path}: '{value}' does not match {schema['pattern']}"]
+            return []
+        checks.append(check_pattern)
+
+    if 'required' in schema:
+        required = schema['required']
+
+        def check_required(value, path):
+            if not isinstance(value, dict):
+                return []
+            return [f"{path}: missing required property '{key}'" for key in required if key not in value]
+        checks.append(check_required)
+
+    properties = {key: compile_schema(sub) for key, sub in schema.get('properties', {}).items()}
+    additional = schema.get('additionalProperties', True)
+    additional_check = compile_schema(additional) if isinstance(additional, dict) else None
+
+    if properties or additional is not True:
+        def check_properties(value, path):
+            if not isinstance(value, dict):
+                return []
+            errors = []
+            for key, item in value.items():
+                item_path = f"{path}.{key}"
+                if key in properties:
+                    errors += properties[key](item, item_path)
+                elif additional is False:
+                    errors.append(f"{path}: property '{key}' is not allowed")
+                elif additional_check is not None:
+                    errors += additional_check(item, item_path)
+            return errors
+        checks.append(check_properties)
+
+    if 'items' in schema:
+        item_check = compile_schema(schema['items'])
+
+        def check_items(value, path):
+            if not isinstance(value, list):
+                return []
+            errors = []
+            for i, item in enumerate(value):
+                errors += item_check(item, f"{path}[{i}]")
+            return errors
+        checks.append(check_items)
+
+    if 'anyOf' in schema:
+        alternatives = [compile_schema(sub) for sub in schema['anyOf']]
+
+        def check_any_of(value, path):
+            results = [alternative(value, path) for alternative in alternatives]
+            if all(results):
+                return [f"{path}: does not match any allowed form ({'; '.join(r[0] for r in results)})"]
+            return []
+        checks.append(check_any_of)
+
+    def validate(value, path='$'):
+        errors = []
+        for check in checks:
+            errors += check(value, path)
+        return errors
+
+    return validate
+
+
+@lru_cache(maxsize=None)
+def load_validator(kind: str):
+    """Load and compile the bundled schema for a kind of file (cached per process)."""
+    with open(SCHEMA_DIR / SCHEMA_FILES[kind], 'r', encoding='utf-8') as f:
+        return compile_schema(json.load(f))
+
+
+def file_kind(relative_path: str) -> str | None:
+    """Return the schema kind of a report file ('visual', 'page', 'theme'), or None."""
+    parts = relative_path.split('/')
+    if parts[-1] == 'visual.json':
+        return 'visual'
+    if parts[-1] == 'page.json':
+        return 'page'
+    if parts[:-1] == ['StaticResources', 'SharedResources', 'BaseThemes'] and parts[-1].endswith('.json'):
+        return 'theme'
+    return None
+
+
+def validate_file(file_path: str, kind: str) -> tuple[list[str], dict | None]:
+    """
+    Validate one file against its schema.
+
+    Returns:
+        Tuple of (error messages, parsed data kept for the layout checks:
+        the position of a visual or the size of a page, else None)
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        return [f"cannot be read as JSON: {e}"], None
+
+    errors = load_validator(kind)(data)
+    if errors or not isinstance(data, dict):
+        return errors, None
+
+    if kind == 'visual':
+        return errors, {
+            'name': data['name'],
+            'position': data['position'],
+            'grouped': 'parentGroupName' in data or 'visualGroup' in data,
+        }
+    if kind == 'page':
+        return errors, {'width': data.get('width'), 'height': data.get('height')}
+    return errors, None
+
+
+def validate_batch(batch: list[tuple[str, str]]) -> list[tuple[list[str], dict | None]]:
+    """Validate a batch of (file path, kind) pairs (runs in a worker process)."""
+    return [validate_file(file_path, kind) for file_path, kind in batch]
+
+
+def check_layout(page_name: str, page: dict, visuals: list[dict]) -> list[str]:
+    """Return warnings for visuals that leave the page or overlap each other."""
+    warnings = []
+    width = page.get('width')
+    height = page.get('height')
+
+    # Visuals inside groups are positioned relative to their group
+    rects = [
+        (v['name'], v['position']['x'], v['position']['y'], v['position']['width'], v['position']['height'])
+        for v in visuals if not v['grouped']
+    ]
+
+    for name, x, y, w, h in rects:
+        if x < 0 or y < 0 or (width is not None and x + w > width) or (height is not None and y + h > height):
+            warnings.append(f"{page_name}: visual '{name}' extends outside the page")
+
+    for i, (name1, x1, y1, w1, h1) in enumerate(rects):
+        for name2, x2, y2, w2, h2 in rects[i + 1:]:
+            if min(x1 + w1, x2 + w2) > max(x1, x2) and min(y1 + h1, y2 + h2) > max(y1, y2):
+                warnings.append(f"{page_name}: visuals '{name1}' and '{name2}' overlap")
+
+    return warnings
+
+
+def validate_report(report_dir: str, workers: int | None = None) -> tuple[list[str], list[str]]:
+    """
+    Validate a .Report folder against the bundled schemas and check its layouts.
+
+    Args:
+        report_dir: Path to the .Report folder
+        workers: Number of processes used for large reports (default: CPU count)
+
+    Returns:
+        Tuple of (schema errors, layout warnings), each message prefixed with
+        the file or page it concerns
+    """
+    report_path = Path(report_dir)
+    if not report_path.is_dir():
+        raise FileNotFoundError(f"Report folder not found: {report_dir}")
+
+    files = []
+    for file_path in sorted(report_path.rglob('*.json')):
+        relative_path = file_path.relative_to(report_path).as_posix()
+        kind = file_kind(relative_path)
+        if kind is not None:
+            files.append((relative_path, str(file_path), kind))
+
+    tasks = [(file_path, kind) for _, file_path, kind in files]
+    if len(tasks) < PARALLEL_MIN_FILES or (workers or os.cpu_count() or 1) == 1:
+        results = validate_batch(tasks)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        batches = [tasks[i:i + BATCH_SIZE] for i in range(0, len(tasks), BATCH_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for batch in executor.map(validate_batch, batches) for result in batch]
+
+    errors = []
+    pages = {}
+    page_visuals = {}
+    for (relative_path, _, kind), (file_errors, info) in zip(files, results):
+        errors += [f"{relative_path}: {error}" for error in file_errors]
+        if info is None:
+            continue
+        page_dir = relative_path.split('/visuals/')[0] if kind == 'visual' else relative_path.rsplit('/', 1)[0]
+        if kind == 'page':
+            pages[page_dir] = info
+        else:
+            page_visuals.setdefault(page_dir, []).append(info)
+
+    warnings = []
+    for page_dir, visuals in page_visuals.items():
+        warnings += check_layout(page_dir.rsplit('/', 1)[-1], pages.get(page_dir, {}), visuals)
+
+    print(f"    Validated {len(files)} files")
+    for error in errors:
+        print(f"    [INVALID] {error}")
+    for warning in warnings:
+        print(f"    [LAYOUT] {warning}")
+
+    return errors, warnings
+
+
+def main():
+    """Main entry point."""
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    report_dir = os.getenv('VALIDATE_REPORT_DIR') or os.getenv('OUTPUT_REPORT_DIR')
+    workers = int(os.getenv('VALIDATE_WORKERS') or 0) or None
+
+    if not report_dir:
+        raise ValueError("VALIDATE_REPORT_DIR (or OUTPUT_REPORT_DIR) not set in .env file")
+
+    print(f"Report Validator")
+    print(f"{'='*50}")
+    print(f"Report: {report_dir}")
+    print(f"{'='*50}\n")
+
+    errors, warnings = validate_report(report_dir, workers)
+
+    print(f"\n{'='*50}")
+    print(f"Validation {'FAILED' if errors else 'passed'}!")
+    print(f"  Schema errors:   {len(errors)}")
+    print(f"  Layout warnings: {len(warnings)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,76 +6,409 @@ This completes the round-trip workflow: flatten -> edit -> restore.
 """
 
 import os
-import re
 import json
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatchcase
 from pathlib import Path
-from dotenv import load_dotenv
-from docx import Document
 
+from flatten_format import (
+    BUNDLE_END_SEPARATOR, BUNDLE_MARKER_PREFIX, FILE_END_MARKER,
+    bytes_hash, cached_file_hash, check_frame, is_bundle, is_manifest, load_hash_cache,
+    parse_file_marker, parse_path_list, parse_ref_marker, read_index_part, read_manifest, save_hash_cache,
+)
 
-# Load environment variables
-load_dotenv()
 
-# File delimiter markers (must match directory_flattener.py)
-FILE_START_PATTERN = r"═══ FILE: (.+?) ═══"
-FILE_END_MARKER = "═══ END FILE ═══"
+def is_selected(path: str, selection: list[str] | None) -> bool:
+    """Check whether a relative file path matches any selection pattern."""
+    if selection is None:
+        return True
+    return any(fnmatchcase(path, pattern) for pattern in selection)
 
 
-def extract_files_from_word(word_file: str) -> dict[str, str]:
+def read_section(paragraphs: list, i: int) -> tuple[str, dict | None, list[str], bool, int] | None:
+    """
+    Read the file section starting at paragraph i.
+
+    When the FILE marker is framed and the end marker sits exactly where the
+    frame says, the body paragraphs are taken without testing each against
+    the marker patterns. Otherwise paragraphs are scanned up to the end
+    marker (or the next FILE marker, if the end marker is missing).
+
+    Returns:
+        Tuple of (path, frame, body paragraph texts, end marker found, index
+        of the next paragraph after the section), or None if paragraph i is
+        not a FILE marker
+    """
+    marker = parse_file_marker(paragraphs[i].text.strip())
+    if marker is None:
+        return None
+    path, frame = marker
+
+    # Skip straight over a framed body
+    if frame is not None:
+        end = i + 1 + frame['lines']
+        if end < len(paragraphs) and paragraphs[end].text.strip() == FILE_END_MARKER:
+            return path, frame, [p.text for p in paragraphs[i + 1:end]], True, end + 1
+
+    body = []
+    j = i + 1
+    while j < len(paragraphs):
+        # Use original paragraph text (preserve whitespace)
+        text = paragraphs[j].text
+        if text.strip() == FILE_END_MARKER:
+            return path, frame, body, True, j + 1
+        if parse_file_marker(text.strip()):
+            break
+        body.append(text)
+        j += 1
+
+    return path, frame, body, False, j
+
+
+def frame_status(content: str | bytes, frame: dict | None, ended: bool) -> str | None:
+    """Return the integrity status of a framed section's content (None if unframed)."""
+    if frame is None:
+        return None
+    if not ended:
+        return 'truncated'
+    return 'ok' if check_frame(content, frame) else 'modified'
+
+
+def record_section(
+    files: dict,
+    integrity: dict | None,
+    path: str,
+    frame: dict | None,
+    body: list[str],
+    ended: bool
+) -> None:
+    """Store a section's content and, for framed sections, its integrity status."""
+    if not body:
+        return
+
+    content = '\n'.join(body)
+    files[path] = content
+
+    status = frame_status(content, frame, ended)
+    if integrity is not None and status is not None:
+        integrity[path] = status
+
+
+def expand_references(
+    files: dict,
+    integrity: dict | None,
+    references: dict[str, str],
+    sources: dict
+) -> None:
+    """
+    Give each file written as a dedup reference the content (and integrity
+    status) of the file it duplicates.
+
+    Args:
+        files: Extracted files, updated in place
+        integrity: Integrity statuses, updated in place (or None)
+        references: Mapping of duplicate paths to their source paths
+        sources: Sources that were extracted but not selected themselves, as
+            (content, integrity status) tuples
+    """
+    for path, source in references.items():
+        if source in files:
+            content = files[source]
+            status = integrity.get(source) if integrity is not None else None
+        elif source in sources:
+            content, status = sources[source]
+        else:
+            print(f"  [MISSING SOURCE] {path}: duplicates {source}, which is not in the document")
+            continue
+
+        files[path] = content
+        if integrity is not None and status is not None:
+            integrity[path] = status
+
+
+def read_indexed_section(paragraphs: list, entry: dict) -> tuple | None:
+    """Read the section an index entry points at, or None if it is no longer there."""
+    start = entry['offset']
+    section = read_section(paragraphs, start) if start < len(paragraphs) else None
+    if section is None or section[0] != entry['path'] or not section[3] \
+            or len(section[2]) != entry['length']:
+        return None
+    return section
+
+
+def extract_selected_from_index(
+    paragraphs: list,
+    index: list[dict],
+    selection: list[str],
+    integrity: dict | None = None
+) -> dict[str, str] | None:
+    """
+    Extract only the selected files by jumping to their indexed paragraphs.
+
+    Returns:
+        Dictionary mapping relative file paths to their content, or None if the
+        index no longer matches the document (e.g. paragraphs added in Word)
+    """
+    files = {}
+    references = {}
+    for entry in index:
+        if not is_selected(entry['path'], selection):
+            continue
+
+        # Confirm the markers are still where the index says they are
+        if 'source' in entry:
+            start = entry['offset']
+            reference = parse_ref_marker(paragraphs[start].text.strip()) if start < len(paragraphs) else None
+            if reference != (entry['path'], entry['source']):
+                return None
+            references[entry['path']] = entry['source']
+            continue
+
+        section = read_indexed_section(paragraphs, entry)
+        if section is None:
+            return None
+        record_section(files, integrity, *section[:4])
+
+    # Read the sources of selected duplicates that were not selected themselves
+    entries = {entry['path']: entry for entry in index if 'source' not in entry}
+    sources = {}
+    for source in set(references.values()) - files.keys():
+        if source not in entries:
+            continue
+        section = read_indexed_section(paragraphs, entries[source])
+        if section is None:
+            return None
+        source_files = {}
+        source_integrity = {}
+        record_section(source_files, source_integrity, *section[:4])
+        if source in source_files:
+            sources[source] = (source_files[source], source_integrity.get(source))
+
+    expand_references(files, integrity, references, sources)
+    return files
+
+
+def extract_files_from_word(
+    word_file: str,
+    selection: list[str] | None = None,
+    integrity: dict | None = None
+) -> dict[str, str]:
     """
     Extract file contents from a flattened Word document.
 
+    A file's content may span several paragraphs (large files are flattened
+    in line-aligned chunks); they are joined back with newlines, which
+    restores the content exactly. Files written as dedup references get the
+    content of the file they duplicate.
+
     Args:
         word_file: Path to the Word document
+        selection: Optional list of relative paths or glob patterns; when given,
+            only matching files are extracted
+        integrity: Optional dict filled with an integrity status for each file
+            whose FILE marker is framed: 'ok', 'modified' (content no longer
+            matches the frame, e.g. edited in Word) or 'truncated' (end marker
+            missing)
 
     Returns:
         Dictionary mapping relative file paths to their content
     """
+    from docx import Document
+
     doc = Document(word_file)
+    paragraphs = doc.element.body.xpath('./w:p')
+
+    # Use the embedded index to skip straight to the selected files
+    if selection is not None:
+        index = read_index_part(doc)
+        if index is not None:
+            selected_integrity = {}
+            files = extract_selected_from_index(paragraphs, index, selection, selected_integrity)
+            if files is not None:
+                if integrity is not None:
+                    integrity.update(selected_integrity)
+                return files
+            print("  File index is out of date - scanning the whole document")
 
     files = {}
-    current_file = None
-    current_content = []
-    in_file_block = False
-
-    for para in doc.paragraphs:
-        text = para.text.strip()
-
-        # Check for file start marker (in headings)
-        start_match = re.match(FILE_START_PATTERN, text)
-        if start_match:
-            # If we were already in a file block, save it first
-            if current_file and current_content:
-                files[current_file] = '\n'.join(current_content)
-
-            # Start new file block
-            current_file = start_match.group(1)
-            current_content = []
-            in_file_block = True
+    references = {}
+    unselected = {}
+    i = 0
+    while i < len(paragraphs):
+        section = read_section(paragraphs, i)
+        if section is None:
+            reference = parse_ref_marker(paragraphs[i].text.strip())
+            if reference is not None and is_selected(reference[0], selection):
+                references[reference[0]] = reference[1]
+            i += 1
             continue
 
-        # Check for file end marker
-        if text == FILE_END_MARKER:
-            if current_file and current_content:
-                files[current_file] = '\n'.join(current_content)
-            current_file = None
-            current_content = []
-            in_file_block = False
-            continue
+        path, frame, body, ended, i = section
+        if is_selected(path, selection):
+            record_section(files, integrity, path, frame, body, ended)
+        else:
+            # Kept unjoined in case a selected duplicate refers to it
+            unselected[path] = (frame, body, ended)
+
+    sources = {}
+    for source in set(references.values()) - files.keys():
+        if source in unselected and unselected[source][1]:
+            frame, body, ended = unselected[source]
+            content = '\n'.join(body)
+            sources[source] = (content, frame_status(content, frame, ended))
+
+    expand_references(files, integrity, references, sources)
+    return files
 
-        # If we're in a file block, collect content
-        if in_file_block and current_file:
-            # Use original paragraph text (preserve whitespace)
-            current_content.append(para.text)
 
-    # Handle case where last file didn't have end marker
-    if current_file and current_content:
-        files[current_file] = '\n'.join(current_content)
+def extract_files_from_bundle(
+    bundle_file: str,
+    selection: list[str] | None = None,
+    integrity: dict | None = None
+) -> dict[str, bytes]:
+    """
+    Extract file contents from a plain-text bundle.
+
+    The bundle is memory-mapped and each file's bytes are sliced straight out
+    of the mapped buffer, so nothing is decoded or split into lines. Framed
+    markers let the reader jump over each body by its byte length instead of
+    searching for the end marker. Files written as dedup references get the
+    bytes of the file they duplicate.
+
+    Args:
+        bundle_file: Path to the bundle written by the flattener
+        selection: Optional list of relative paths or glob patterns
+        integrity: Optional dict filled with an integrity status per framed
+            file, as for extract_files_from_word()
+
+    Returns:
+        Dictionary mapping relative file paths to their raw bytes
+    """
+    files = {}
+    references = {}
+    unselected = {}
+
+    with open(bundle_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return files
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            while True:
+                # FILE and REF markers always start a line
+                start = mm.find(BUNDLE_MARKER_PREFIX, pos)
+                if start == -1:
+                    break
+                if start > 0 and mm[start - 1] != ord('\n'):
+                    pos = start + len(BUNDLE_MARKER_PREFIX)
+                    continue
+
+                line_end = mm.find(b'\n', start)
+                if line_end == -1:
+                    break
+                line = mm[start:line_end].decode('utf-8', errors='replace').strip()
+                pos = line_end + 1
+
+                reference = parse_ref_marker(line)
+                if reference is not None:
+                    if is_selected(reference[0], selection):
+                        references[reference[0]] = reference[1]
+                    continue
+
+                marker = parse_file_marker(line)
+                if marker is None:
+                    continue
+                path, frame = marker
+
+                body_start = line_end + 1
+                end = body_start + frame['bytes'] if frame is not None else -1
+                ended = True
+                if frame is not None and \
+                        mm[end:end + len(BUNDLE_END_SEPARATOR)] == BUNDLE_END_SEPARATOR:
+                    pos = end + len(BUNDLE_END_SEPARATOR)
+                else:
+                    end = mm.find(BUNDLE_END_SEPARATOR, body_start)
+                    if end == -1:
+                        # Missing end marker: take the rest of the bundle
+                        end = len(mm)
+                        ended = False
+                        pos = end
+                    else:
+                        pos = end + len(BUNDLE_END_SEPARATOR)
+
+                if not is_selected(path, selection):
+                    # Only the span is kept, in case a selected duplicate refers to it
+                    unselected[path] = (frame, body_start, end, ended)
+                    continue
+
+                files[path] = mm[body_start:end]
+                status = frame_status(files[path], frame, ended)
+                if integrity is not None and status is not None:
+                    integrity[path] = status
+
+            sources = {}
+            for source in set(references.values()) - files.keys():
+                if source in unselected:
+                    frame, body_start, end, ended = unselected[source]
+                    content = mm[body_start:end]
+                    sources[source] = (content, frame_status(content, frame, ended))
+
+    expand_references(files, integrity, references, sources)
+    return files
+
+
+def extract_volume(volume_file: str, selection: list[str] | None) -> tuple[dict[str, str], dict[str, str]]:
+    """Extract one volume's files and integrity statuses (runs in a worker process)."""
+    integrity = {}
+    files = extract_files_from_word(volume_file, selection, integrity)
+    return files, integrity
+
+
+def extract_files_from_manifest(
+    manifest_file: str,
+    selection: list[str] | None = None,
+    workers: int | None = None,
+    integrity: dict | None = None
+) -> dict[str, str]:
+    """
+    Extract file contents from all volumes listed in a volume manifest.
+
+    Volumes are parsed concurrently; volumes holding none of the selected
+    files are not opened at all.
+
+    Args:
+        manifest_file: Path to the manifest written by the flattener
+        selection: Optional list of relative paths or glob patterns
+        workers: Number of processes used to parse volumes (default: CPU count)
+        integrity: Optional dict filled with an integrity status per framed
+            file, as for extract_files_from_word()
+
+    Returns:
+        Dictionary mapping relative file paths to their content
+    """
+    manifest = read_manifest(Path(manifest_file))
+
+    volumes = [
+        volume['file'] for volume in manifest['volumes']
+        if any(is_selected(path, selection) for path in volume['files'])
+    ]
+    for volume in volumes:
+        if not Path(volume).exists():
+            raise FileNotFoundError(f"Volume listed in manifest not found: {volume}")
+
+    files = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for volume_files, volume_integrity in executor.map(
+                extract_volume, volumes, [selection] * len(volumes)):
+            files.update(volume_files)
+            if integrity is not None:
+                integrity.update(volume_integrity)
 
     return files
 
 
-def validate_json(content: str, file_path: str) -> tuple[bool, str | None]:
+def validate_json(content: str | bytes, file_path: str) -> tuple[bool, str | None]:
     """
     Validate JSON content.
 
@@ -90,18 +423,49 @@ def validate_json(content: str, file_path: str) -> tuple[bool, str | None]:
         return True, None
     except json.JSONDecodeError as e:
         return False, f"JSON error at line {e.lineno}, col {e.colno}: {e.msg}"
+    except UnicodeDecodeError as e:
+        return False, f"JSON encoding error: {e.reason}"
 
 
-def restore_files(files: dict[str, str], output_dir: str) -> tuple[int, int, list[str]]:
+def encode_content(content: str) -> bytes:
+    """Encode file content exactly as a UTF-8 text-mode write would."""
+    if os.linesep != '\n':
+        content = content.replace('\n', os.linesep)
+    return content.encode('utf-8')
+
+
+def default_hash_cache_file(output_dir: str) -> Path:
+    """
+    Hash cache location used for incremental restores: one file per output
+    folder in the user's cache directory, so nothing is written into the
+    project (or its git working tree).
+    """
+    output_path = Path(output_dir).absolute()
+    cache_root = os.getenv('LOCALAPPDATA') or os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache'
+    key = bytes_hash(str(output_path).encode('utf-8'))[:16]
+    return Path(cache_root) / 'pbi_toolkit' / 'hashes' / f"{output_path.name}-{key}.json"
+
+
+def restore_files(
+    files: dict[str, str | bytes],
+    output_dir: str,
+    incremental: bool = False,
+    hash_cache_file: str | None = None
+) -> tuple[int, int, int, list[str]]:
     """
     Write extracted files to the output directory.
 
     Args:
-        files: Dictionary mapping relative paths to content
+        files: Dictionary mapping relative paths to content (text, or raw
+            bytes written as-is)
         output_dir: Base directory to write files to
+        incremental: Skip files whose existing content is already identical,
+            leaving their modification times untouched
+        hash_cache_file: Hash cache used by incremental mode (defaults to a
+            file in the user's cache directory, see default_hash_cache_file)
 
     Returns:
-        Tuple of (files_written, files_failed, error_messages)
+        Tuple of (files_written, files_unchanged, files_failed, error_messages)
     """
     output_path = Path(output_dir)
 
@@ -109,9 +473,14 @@ def restore_files(files: dict[str, str], output_dir: str) -> tuple[int, int, lis
     output_path.mkdir(parents=True, exist_ok=True)
 
     files_written = 0
+    files_unchanged = 0
     files_failed = 0
     errors = []
 
+    if incremental:
+        cache_file = Path(hash_cache_file) if hash_cache_file else default_hash_cache_file(output_dir)
+        hash_cache = load_hash_cache(cache_file)
+
     for relative_path, content in files.items():
         file_path = output_path / relative_path
 
@@ -125,12 +494,32 @@ def restore_files(files: dict[str, str], output_dir: str) -> tuple[int, int, lis
             continue
 
         try:
+            data = content if isinstance(content, bytes) else encode_content(content)
+
+            # Skip the write when the target already holds identical content
+            if incremental:
+                new_hash = bytes_hash(data)
+                try:
+                    stat = file_path.stat()
+                except FileNotFoundError:
+                    stat = None
+                if stat is not None and stat.st_size == len(data) \
+                        and cached_file_hash(file_path, relative_path, hash_cache, stat) == new_hash:
+                    files_unchanged += 1
+                    continue
+
             # Create parent directories
             file_path.parent.mkdir(parents=True, exist_ok=True)
 
             # Write file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            with open(file_path, 'wb') as f:
+                f.write(data)
+
+            if incremental:
+                stat = file_path.stat()
+                hash_cache[relative_path] = {
+                    'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': new_hash
+                }
 
             print(f"  [OK] {relative_path}")
             files_written += 1
@@ -140,37 +529,98 @@ def restore_files(files: dict[str, str], output_dir: str) -> tuple[int, int, lis
             errors.append(f"{relative_path}: {e}")
             files_failed += 1
 
-    return files_written, files_failed, errors
+    if incremental:
+        save_hash_cache(cache_file, hash_cache)
+
+    return files_written, files_unchanged, files_failed, errors
 
 
-def restore_from_word(word_file: str, output_dir: str) -> None:
+def restore_from_word(
+    word_file: str,
+    output_dir: str,
+    selection: list[str] | None = None,
+    incremental: bool = False,
+    workers: int | None = None,
+    strict: bool = False
+) -> None:
     """
     Restore a .Report folder from a flattened Word document.
 
+    Files whose framed FILE marker shows they were truncated (end marker
+    missing) are reported and not written. Files whose content no longer
+    matches their frame are listed as changed since flattening - expected
+    after editing in Word - and are only refused in strict mode.
+
     Args:
-        word_file: Path to the edited Word document
+        word_file: Path to the edited Word document, the manifest of a
+            document split into volumes, or a plain-text bundle
         output_dir: Path to output .Report folder
+        selection: Optional list of relative paths or glob patterns to restore
+            (all files are restored when omitted)
+        incremental: Only write files whose content differs from what is
+            already in the output folder
+        workers: Number of processes used to parse volumes (default: CPU count)
+        strict: Treat files whose content does not match their frame as
+            corrupted (for automated round trips where nothing is edited)
     """
     word_path = Path(word_file)
 
     if not word_path.exists():
         raise FileNotFoundError(f"Word document not found: {word_file}")
 
-    print(f"Parsing Word document...")
-    files = extract_files_from_word(word_file)
+    integrity = {}
+    if is_manifest(word_file):
+        print(f"Parsing Word document volumes...")
+        files = extract_files_from_manifest(word_file, selection, workers, integrity)
+    elif is_bundle(word_file):
+        print(f"Reading bundle...")
+        files = extract_files_from_bundle(word_file, selection, integrity)
+    else:
+        print(f"Parsing Word document...")
+        files = extract_files_from_word(word_file, selection, integrity)
 
     if not files:
+        if selection is not None:
+            raise ValueError(f"No files in Word document match the selection: {', '.join(selection)}")
         raise ValueError("No files found in Word document. Check that FILE markers are intact.")
 
     print(f"Found {len(files)} files to restore.\n")
+
+    # Hold back files that failed their integrity check
+    corrupted = []
+    modified = []
+    for path, status in integrity.items():
+        if status == 'truncated':
+            corrupted.append(f"{path}: end marker missing (content may be truncated)")
+            del files[path]
+        elif status == 'modified' and strict:
+            corrupted.append(f"{path}: content does not match the length/hash in its FILE marker")
+            del files[path]
+        elif status == 'modified':
+            modified.append(path)
+
+    if corrupted:
+        print("Corrupted files (not written):")
+        for error in corrupted:
+            print(f"  [CORRUPTED] {error}")
+        print()
+
     print("Restoring files:")
 
-    files_written, files_failed, errors = restore_files(files, output_dir)
+    files_written, files_unchanged, files_failed, errors = restore_files(
+        files, output_dir, incremental
+    )
+    files_failed += len(corrupted)
+    errors = corrupted + errors
 
     print(f"\n{'='*50}")
     print(f"Restoration complete!")
-    print(f"  Files written: {files_written}")
-    print(f"  Files failed:  {files_failed}")
+    print(f"  Files written:   {files_written}")
+    if incremental:
+        print(f"  Files unchanged: {files_unchanged}")
+    print(f"  Files failed:    {files_failed}")
+    if modified:
+        print(f"  Files changed since flattening: {len(modified)}")
     print(f"  Output: {Path(output_dir).absolute()}")
 
     if errors:
@@ -182,8 +632,16 @@ def restore_from_word(word_file: str, output_dir: str) -> None:
 
 def main():
     """Main entry point."""
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
     input_word = os.getenv('INPUT_WORD_DOC')
     output_dir = os.getenv('OUTPUT_REPORT_DIR')
+    selection = parse_path_list(os.getenv('RESTORE_FILES'))
+    incremental = os.getenv('RESTORE_INCREMENTAL', '').lower() in ('1', 'true', 'yes')
+    workers = int(os.getenv('VOLUME_WORKERS') or 0) or None
+    strict = os.getenv('RESTORE_STRICT', '').lower() in ('1', 'true', 'yes')
 
     if not input_word:
         raise ValueError("INPUT_WORD_DOC not set in .env file")
@@ -194,9 +652,13 @@ def main():
     print(f"{'='*50}")
     print(f"Input:  {input_word}")
     print(f"Output: {output_dir}")
+    if selection:
+        print(f"Select: {', '.join(selection)}")
+    if incremental:
+        print(f"Mode:   incremental (unchanged files are skipped)")
     print(f"{'='*50}\n")
 
-    restore_from_word(input_word, output_dir)
+    restore_from_word(input_word, output_dir, selection, incremental, workers, strict)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,213 @@
+"""
+Round-Trip Verification for Power BI Projects
+
+Flattens a directory, restores it to a temporary folder and compares both
+trees file by file, proving that flatten -> restore reproduces the original.
+Only mismatching files are listed, together with the likely cause (line
+endings, encoding, trailing newline or content) and per-phase timings.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from directory_flattener import (
+    DEFAULT_CHUNK_SIZE, flatten_directory_to_word, is_binary_file, read_file_content, walk_directory,
+)
+from flatten_format import file_hash, parse_path_list
+from restore_from_word import restore_from_word
+
+
+# Same-size file pairs hashed per worker task
+HASH_BATCH_SIZE = 256
+
+# Output file used for each backend
+BACKEND_OUTPUTS = {
+    'docx': 'roundtrip.docx',
+    'bundle': 'roundtrip.txt',
+}
+
+
+def list_files(root: Path, exclude: list[str] | None = None, include: list[str] | None = None) -> dict[str, Path]:
+    """Map relative posix paths to file paths for every file the flattener would visit."""
+    return {
+        file_path.relative_to(root).as_posix(): file_path
+        for file_path in walk_directory(root, exclude, include)
+    }
+
+
+def classify_difference(original: Path, restored: Path) -> str:
+    """Describe how a restored file differs from its original."""
+    a = original.read_bytes()
+    b = restored.read_bytes()
+
+    if a.replace(b'\r\n', b'\n') == b.replace(b'\r\n', b'\n'):
+        return 'line endings'
+    if a.rstrip(b'\r\n') == b.rstrip(b'\r\n'):
+        return 'trailing newline'
+
+    text_a = read_file_content(original)
+    text_b = read_file_content(restored)
+    if text_a is not None and text_a.lstrip('\ufeff') == (text_b or '').lstrip('\ufeff'):
+        return 'encoding'
+    return 'content'
+
+
+def compare_trees(
+    source: Path,
+    restored: Path,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    workers: int | None = None
+) -> tuple[list[dict], int, int]:
+    """
+    Compare a source tree with its restored copy.
+
+    Sizes are compared first; only same-size pairs are hashed, in parallel.
+    Binary files (which are never flattened) are not compared.
+
+    Returns:
+        Tuple of (mismatches as {path, problem} dicts, files compared,
+        binary files skipped)
+    """
+    source_files = list_files(source, exclude, include)
+    restored_files = list_files(restored)
+
+    mismatches = []
+    to_hash = []
+    binary_skipped = 0
+
+    for path, source_file in source_files.items():
+        restored_file = restored_files.pop(path, None)
+        if restored_file is None:
+            # Binary files are never flattened, so only check files that are absent
+            if is_binary_file(source_file):
+                binary_skipped += 1
+            else:
+                mismatches.append({'path': path, 'problem': 'missing after restore'})
+        elif source_file.stat().st_size != restored_file.stat().st_size:
+            mismatches.append({'path': path, 'problem': classify_difference(source_file, restored_file)})
+        else:
+            to_hash.append((path, source_file, restored_file))
+
+    for path in restored_files:
+        mismatches.append({'path': path, 'problem': 'not in source'})
+
+    # Hash both copies of every same-size pair in parallel (hashlib releases
+    # the GIL); pairs are handed out in batches to keep per-task overhead low
+    def differing(batch: list[tuple[str, Path, Path]]) -> list[tuple[str, Path, Path]]:
+        return [pair for pair in batch if file_hash(pair[1]) != file_hash(pair[2])]
+
+    batches = [to_hash[i:i + HASH_BATCH_SIZE] for i in range(0, len(to_hash), HASH_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch_differing in executor.map(differing, batches):
+            for path, source_file, restored_file in batch_differing:
+                mismatches.append({'path': path, 'problem': classify_difference(source_file, restored_file)})
+
+    compared = len(source_files) - binary_skipped
+    return sorted(mismatches, key=lambda m: m['path']), compared, binary_skipped
+
+
+def verify_roundtrip(
+    input_dir: str,
+    backend: str = 'docx',
+    workers: int | None = None,
+    exclude: list[str] | None = None,
+    include: list[str] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> list[dict]:
+    """
+    Flatten a directory, restore it to a temporary folder and compare.
+
+    Args:
+        input_dir: Directory to verify
+        backend: 'docx' (Word document) or 'bundle' (plain-text bundle)
+        workers: Number of threads used for hashing
+        exclude: Extra .gitignore-style exclude patterns, as for the flattener
+        include: Only verify files matching one of these patterns
+        chunk_size: Chunk size passed to the flattener
+
+    Returns:
+        List of mismatches as {path, problem} dicts (empty if identical)
+    """
+    input_path = Path(input_dir)
+
+    if not input_path.is_dir():
+        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    if backend not in BACKEND_OUTPUTS:
+        raise ValueError(f"Unknown backend '{backend}' (expected one of: {', '.join(BACKEND_OUTPUTS)})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = Path(tmp) / BACKEND_OUTPUTS[backend]
+        restore_dir = Path(tmp) / input_path.name
+
+        # Flatten and restore quietly; only the comparison is reported
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            flatten_directory_to_word(
+                str(input_path), str(output_file), exclude=exclude, include=include, chunk_size=chunk_size
+            )
+        flatten_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            restore_from_word(str(output_file), str(restore_dir))
+        restore_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mismatches, compared, binary_skipped = compare_trees(
+            input_path, restore_dir, exclude, include, workers
+        )
+        compare_s = time.perf_counter() - start
+
+    if mismatches:
+        print("Mismatches:")
+        for mismatch in mismatches:
+            print(f"  [{mismatch['problem'].upper()}] {mismatch['path']}")
+        print()
+
+    print(f"{'='*50}")
+    print(f"Verification {'FAILED' if mismatches else 'passed'}!")
+    print(f"  Files compared:   {compared}")
+    print(f"  Binary skipped:   {binary_skipped}")
+    print(f"  Mismatches:       {len(mismatches)}")
+    print(f"  Flatten:  {flatten_s:.2f}s")
+    print(f"  Restore:  {restore_s:.2f}s")
+    print(f"  Compare:  {compare_s:.2f}s")
+
+    return mismatches
+
+
+def main():
+    """Main entry point."""
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    input_dir = os.getenv('INPUT_DIR')
+    backend = os.getenv('VERIFY_BACKEND') or 'docx'
+    workers = int(os.getenv('VERIFY_WORKERS') or 0) or None
+    exclude = parse_path_list(os.getenv('FLATTEN_EXCLUDE'))
+    include = parse_path_list(os.getenv('FLATTEN_INCLUDE'))
+    chunk_size = int(os.getenv('FLATTEN_CHUNK_SIZE') or DEFAULT_CHUNK_SIZE)
+
+    if not input_dir:
+        raise ValueError("INPUT_DIR not set in .env file")
+
+    print(f"Round-Trip Verification")
+    print(f"{'='*50}")
+    print(f"Input:   {input_dir}")
+    print(f"Backend: {backend}")
+    print(f"{'='*50}\n")
+
+    mismatches = verify_roundtrip(input_dir, backend, workers, exclude, include, chunk_size)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()